@@ -3,14 +3,141 @@ try:
 except Exception:
     pyautogui = None
 
+import hashlib
+import io
 import time
+from typing import Callable, Dict, List, Optional, Tuple
+
 from ..core.interfaces import Collector
 from ..core.models import CollectRequest, CollectResponse
 
+Region = Tuple[int, int, int, int]  # (left, top, width, height)
+
+
+def parse_region(selector: Optional[str], region=None) -> Optional[Region]:
+    """
+    Região de captura da task: extra.region ([x, y, w, h] ou {left, top, width, height})
+    ou, na falta dela, o selector no formato "x,y,w,h". None = tela inteira.
+    """
+    if region is None and selector:
+        region = [p.strip() for p in selector.split(",")]
+    if region is None:
+        return None
+    if isinstance(region, dict):
+        region = [region.get(k) for k in ("left", "top", "width", "height")]
+    try:
+        left, top, width, height = (int(v) for v in region)
+    except Exception:
+        raise ValueError(f"Região inválida (esperado x,y,w,h): {region!r}")
+    if width <= 0 or height <= 0:
+        raise ValueError(f"Região com largura/altura inválida: {region!r}")
+    return left, top, width, height
+
+
+def pyautogui_screenshot(region: Optional[Region]):
+    if pyautogui is None:
+        raise RuntimeError("PyAutoGUI não está instalado no ambiente.")
+    return pyautogui.screenshot(region=region)  # PIL Image
+
+
+class ReplayScreenshotProvider:
+    """Devolve imagens do disco em sequência (testes/depuração sem display)."""
+
+    def __init__(self, paths: List[str]):
+        self.paths = list(paths)
+        self.pos = 0
+
+    def __call__(self, region: Optional[Region]):
+        from PIL import Image
+
+        path = self.paths[min(self.pos, len(self.paths) - 1)]
+        self.pos += 1
+        with Image.open(path) as img:
+            img.load()
+            if region:
+                left, top, width, height = region
+                return img.crop((left, top, left + width, top + height))
+            return img.copy()
+
+
+def _dhash(img, size: int = 16) -> int:
+    # hash perceptual por diferença: compara vizinhos de uma miniatura em cinza
+    small = img.convert("L").resize((size + 1, size))
+    px = list(small.getdata())
+    bits = 0
+    for row in range(size):
+        for col in range(size):
+            left = px[row * (size + 1) + col]
+            bits = (bits << 1) | (left > px[row * (size + 1) + col + 1])
+    return bits
+
+
 class DesktopCollector(Collector):
+    """
+    Captura a tela (ou uma região) e detecta se ela mudou desde a captura anterior.
+    - raw: PNG em memória (bytes), não o objeto PIL
+    - meta.unchanged=True quando o hash bate com a captura anterior da mesma
+      região (meta.capture_key); nesse caso o PNG anterior é reaproveitado
+      (sem reencodar) e o Runner reaproveita o valor já extraído dele
+    Config (req.extra): region, delay_ms, change_detection ("exact" | "perceptual"),
+    hash_threshold (bits de diferença tolerados no modo perceptual), capture_key.
+    """
+
+    def __init__(self, screenshot_provider: Callable = None, delay_ms: int = 500):
+        self.screenshot_provider = screenshot_provider or pyautogui_screenshot
+        self.delay_ms = delay_ms
+        # capture_key -> (hash, png) da última captura
+        self._last: Dict[str, Tuple[object, bytes]] = {}
+
+    def _fingerprint(self, img, mode: str):
+        if mode == "perceptual":
+            return _dhash(img)
+        if mode != "exact":
+            raise ValueError(f"change_detection não suportado: {mode}")
+        h = hashlib.blake2b(digest_size=16)
+        h.update(f"{img.mode}{img.size}".encode("ascii"))
+        h.update(img.tobytes())
+        return h.hexdigest()
+
     def collect(self, req: CollectRequest) -> CollectResponse:
-        if pyautogui is None:
-            raise RuntimeError("PyAutoGUI não está instalado no ambiente.")
-        time.sleep(0.5)
-        screenshot = pyautogui.screenshot()  # PIL Image
-        return CollectResponse(raw=screenshot, extracted=None, meta={"source": "desktop"})
+        extra = req.extra or {}
+        region = parse_region(req.selector, extra.get("region"))
+        delay_ms = int(extra.get("delay_ms", self.delay_ms))
+        mode = extra.get("change_detection", "exact")
+        threshold = int(extra.get("hash_threshold", 0))
+        key = extra.get("capture_key") or f"{req.source}|{region}"
+
+        if delay_ms:
+            time.sleep(delay_ms / 1000)
+        img = self.screenshot_provider(region)
+        fingerprint = self._fingerprint(img, mode)
+
+        prev = self._last.get(key)
+        if prev is None:
+            unchanged = False
+        elif mode == "perceptual":
+            unchanged = bin(prev[0] ^ fingerprint).count("1") <= threshold
+        else:
+            unchanged = prev[0] == fingerprint
+
+        if unchanged:
+            png = prev[1]
+        else:
+            buf = io.BytesIO()
+            img.save(buf, format="PNG")
+            png = buf.getvalue()
+            self._last[key] = (fingerprint, png)
+        img.close()
+
+        return CollectResponse(
+            raw=png,
+            extracted=None,
+            meta={
+                "source": "desktop",
+                "region": list(region) if region else None,
+                "hash": fingerprint if mode == "exact" else f"{fingerprint:064x}",
+                "unchanged": unchanged,
+                "capture_key": key,
+                "bytes": len(png),
+            },
+        )
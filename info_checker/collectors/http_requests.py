@@ -2,22 +2,39 @@ import requests
 from bs4 import BeautifulSoup
 from ..core.interfaces import Collector
 from ..core.models import CollectRequest, CollectResponse
+from ..core.payload import Payload
 
 class HttpCollector(Collector):
-    def __init__(self, headers=None, timeout=20):
+    def __init__(self, headers=None, timeout=20, chunk_size=64 * 1024):
         self.headers = headers or {"User-Agent": "InfoChecker/1.0"}
         self.timeout = timeout
+        self.chunk_size = chunk_size
 
     def collect(self, req: CollectRequest) -> CollectResponse:
-        resp = requests.request(req.method, req.source, headers=self.headers, timeout=self.timeout)
-        resp.raise_for_status()
-        return CollectResponse(raw=resp.text, extracted=None, meta={"status": resp.status_code})
+        # corpo lido em streaming para um Payload (vai para disco se for grande)
+        with requests.request(req.method, req.source, headers=self.headers,
+                              timeout=self.timeout, stream=True) as resp:
+            resp.raise_for_status()
+            payload = Payload(encoding=resp.encoding or "utf-8")
+            for chunk in resp.iter_content(chunk_size=self.chunk_size):
+                payload.write(chunk)
+        return CollectResponse(raw=payload, extracted=None,
+                               meta={"status": resp.status_code, "bytes": payload.size})
 
-def simple_bs_extract(html: str, extraction_cfg: dict) -> str:
-    soup = BeautifulSoup(html, "html.parser")
+def parse_html(html) -> BeautifulSoup:
+    # aceita str ou Payload (este é lido como stream, sem montar a string inteira)
+    if isinstance(html, Payload):
+        with html.open() as fp:
+            return BeautifulSoup(fp, "html.parser", from_encoding=html.encoding)
+    return BeautifulSoup(html, "html.parser")
+
+def simple_bs_extract(html, extraction_cfg: dict, soup: BeautifulSoup = None) -> str:
+    # soup: documento já parseado (ex.: compartilhado entre tasks da mesma URL)
     strat = extraction_cfg.get("strategy", "css")
     if strat != "css":
         raise ValueError("Unsupported extraction strategy for HTTP: %s" % strat)
+    if soup is None:
+        soup = parse_html(html)
     path = extraction_cfg["path"]
     el = soup.select_one(path)
     return el.get_text(strip=True) if el else None
@@ -4,25 +4,28 @@ try:
     from playwright.sync_api import sync_playwright, TimeoutError as PWTimeoutError
 except Exception:
     sync_playwright = None
+    PWTimeoutError = TimeoutError
 
 import os
 import re
-import glob
 import csv
+import json
+import time
+import itertools
 from pathlib import Path
-from urllib.parse import quote
+from urllib.parse import quote, urlsplit
 from typing import Optional
 
 from dotenv import load_dotenv
 
 from info_checker.core.interfaces import Collector
 from info_checker.core.models import CollectRequest, CollectResponse
+from info_checker.core.payload import Payload
+from info_checker.utils.exports import merge_csvs_to_xlsx
+from info_checker.utils.locking import file_lock
+from info_checker.utils.log import get_logger
 
-# pandas opcional (para Excel)
-try:
-    import pandas as pd
-except ImportError:
-    pd = None
+log = get_logger(__name__)
 
 # ---------------------- helpers de parsing ----------------------
 _MONTH_RE = re.compile(r"^(jan|fev|mar|abr|mai|jun|jul|ago|set|out|nov|dez)/\d{2}$", re.I)
@@ -33,20 +36,35 @@ def _is_month_token(s: str) -> bool:
 def _norm(s: str) -> str:
     return (s or "").strip()
 
+def _as_strategy(value) -> Optional[tuple]:
+    # JSON devolve listas; as estratégias são comparadas como tuplas
+    return tuple(value) if value else None
+
+# caminho default do cache de estratégias de login (só seletores, sem credenciais)
+DEFAULT_LOGIN_CACHE = str(Path("exports") / "login_strategies.json")
+
+# termos de URL do embed, do mais específico (rank 0) ao mais genérico
+_PBI_TARGETS = ("app.powerbi.com/reportembed", "powerbi", "report", "relatorio.aspx", "reportid=")
+
 # =======================================================================
 
 class PlaywrightCollector(Collector):
     """
     Coletor Playwright para extrair dados de relatórios Power BI EMBED.
-    - Login robusto (ASP.NET WebForms, com fallbacks: clique, submit e __doPostBack)
+    - Login robusto (ASP.NET WebForms, com fallbacks: clique, submit e __doPostBack),
+      memorizando por URL de login o caminho que funcionou
     - Localiza iframe do Power BI
     - Extrai tabela/tab visível (grid/table) e exporta CSV
     - Junta CSVs em Excel (se pandas estiver instalado)
     """
 
-    def __init__(self, headless: bool = True, default_timeout_ms: int = 30000):
+    def __init__(self, headless: bool = True, default_timeout_ms: int = 30000,
+                 login_cache: Optional[str] = DEFAULT_LOGIN_CACHE):
         self.headless = headless
         self.default_timeout_ms = default_timeout_ms
+        # login_url normalizada -> {frame, username, password, submit} que funcionaram
+        self.login_cache_path = Path(login_cache) if login_cache else None
+        self._login_strategies: dict = self._load_login_cache()
         load_dotenv()
         self.export_dir = Path("exports") / "powerbi"
         self.export_dir.mkdir(parents=True, exist_ok=True)
@@ -54,15 +72,17 @@ class PlaywrightCollector(Collector):
         self.debug_dir.mkdir(parents=True, exist_ok=True)
 
     # ---------------------- utilidades ----------------------
-    def _save_html(self, page, name: str):
+    def _save_html(self, page, name: str, debug_dir: Optional[Path] = None):
         try:
-            path_html = self.debug_dir / f"{name}.html"
-            path_png  = self.debug_dir / f"{name}.png"
+            debug_dir = debug_dir or self.debug_dir
+            debug_dir.mkdir(parents=True, exist_ok=True)
+            path_html = debug_dir / f"{name}.html"
+            path_png  = debug_dir / f"{name}.png"
             with open(path_html, "w", encoding="utf-8") as f:
                 f.write(page.content())
             page.screenshot(path=str(path_png), full_page=True)
-            print(f"[DEBUG] HTML: {path_html.resolve()}")
-            print(f"[DEBUG] PNG : {path_png.resolve()}")
+            log.debug(f"HTML: {path_html.resolve()}")
+            log.debug(f"PNG : {path_png.resolve()}")
         except Exception:
             pass
 
@@ -77,200 +97,396 @@ class PlaywrightCollector(Collector):
         return False
 
     # ---------------------- LOGIN ----------------------
-    def _fill_username(self, ctx, username: str) -> bool:
-        print("[DEBUG] Tentando preencher o nome de usuário...")
-        # seletor exato ASP.NET
-        if self._try_fill(ctx, '#lgnCredencial_UserName', username):
-            print("[DEBUG] Usuário preenchido com sucesso.")
-            return True
-
-        # genéricos (fallback)
-        for fn in (
-            lambda: ctx.get_by_placeholder("Login").fill(username),
-            lambda: ctx.get_by_label("Login", exact=False).fill(username),
-            lambda: ctx.get_by_placeholder("Usuário").fill(username),
-            lambda: ctx.get_by_label("Usuário", exact=False).fill(username),
-            lambda: ctx.get_by_placeholder("E-mail").fill(username),
-            lambda: ctx.get_by_label("E-mail", exact=False).fill(username),
-        ):
-            try:
-                fn(); return True
-            except Exception:
-                pass
-
+    # Estratégias em ordem de tentativa. Cada uma é (tipo, argumento):
+    #   css -> _try_fill/click no seletor; placeholder/label -> get_by_*.fill
+    _USERNAME_STRATEGIES = [
+        ("css", "#lgnCredencial_UserName"),  # seletor exato ASP.NET
+        ("placeholder", "Login"), ("label", "Login"),
+        ("placeholder", "Usuário"), ("label", "Usuário"),
+        ("placeholder", "E-mail"), ("label", "E-mail"),
         # ASP.NET WebForms: ids terminando com UserName
-        for sel in ['input[id$="UserName"]','input[name$="UserName"]']:
-            if self._try_fill(ctx, sel, username): return True
-
+        ("css", 'input[id$="UserName"]'), ("css", 'input[name$="UserName"]'),
         # genéricos
-        for sel in [
-            'input[name="username"]','input[id="username"]',
-            'input[type="email"]','input[type="text"]:not([hidden])',
-            'input[name*="user" i]','input[id*="user" i]',
-            'input[name*="login" i]','input[id*="login" i]',
-            'input:not([type]):not([hidden])',
-        ]:
-            if self._try_fill(ctx, sel, username): return True
-
-        return False
-
-    def _fill_password(self, ctx, password: str) -> bool:
-        print("[DEBUG] Tentando preencher a senha...")
-        # seletor exato ASP.NET
-        if self._try_fill(ctx, '#lgnCredencial_Password', password):
-            print("[DEBUG] Senha preenchida com sucesso.")
+        ("css", 'input[name="username"]'), ("css", 'input[id="username"]'),
+        ("css", 'input[type="email"]'), ("css", 'input[type="text"]:not([hidden])'),
+        ("css", 'input[name*="user" i]'), ("css", 'input[id*="user" i]'),
+        ("css", 'input[name*="login" i]'), ("css", 'input[id*="login" i]'),
+        ("css", 'input:not([type]):not([hidden])'),
+    ]
+    _PASSWORD_STRATEGIES = [
+        ("css", "#lgnCredencial_Password"),  # seletor exato ASP.NET
+        ("placeholder", "Senha"), ("label", "Senha"),
+        ("css", 'input[id$="Password"]'), ("css", 'input[name$="Password"]'),
+        ("css", 'input[name="password"]'), ("css", 'input[id="password"]'), ("css", 'input[type="password"]'),
+        ("css", 'input[name*="senha" i]'), ("css", 'input[id*="senha" i]'),
+        ("css", 'input[name*="pass" i]'), ("css", 'input[id*="pass" i]'),
+    ]
+    _SUBMIT_STRATEGIES = [
+        # 1) botão clássico e alternativos
+        ("click", "#lgnCredencial_LoginButton"),
+        ("click", 'input[type="submit"]'), ("click", 'input[type="image"]'), ("click", 'button[type="submit"]'),
+        ("click", 'button:has-text("Entrar")'), ("click", 'a:has-text("Entrar")'),
+        ("click", 'button:has-text("Acessar")'), ("click", 'a:has-text("Acessar")'),
+        ("click", '[id$="LoginButton"]'), ("click", '[name$="LoginButton"]'),
+        # 2) submit do form, 3) __doPostBack (ASP.NET), 4) Enter no campo senha
+        ("form_submit", None), ("postback", None), ("enter", None),
+    ]
+
+    def _apply_fill(self, ctx, strategy, value: str) -> bool:
+        kind, arg = strategy
+        if kind == "css":
+            return self._try_fill(ctx, arg, value)
+        try:
+            if kind == "placeholder":
+                ctx.get_by_placeholder(arg).fill(value)
+            elif kind == "label":
+                ctx.get_by_label(arg, exact=False).fill(value)
+            else:
+                return False
             return True
+        except Exception:
+            return False
 
-        # fallbacks
-        for fn in (
-            lambda: ctx.get_by_placeholder("Senha").fill(password),
-            lambda: ctx.get_by_label("Senha", exact=False).fill(password),
-        ):
-            try:
-                fn(); return True
-            except Exception:
-                pass
-
-        for sel in ['input[id$="Password"]','input[name$="Password"]']:
-            if self._try_fill(ctx, sel, password): return True
-
-        for sel in [
-            'input[name="password"]','input[id="password"]','input[type="password"]',
-            'input[name*="senha" i]','input[id*="senha" i]',
-            'input[name*="pass" i]','input[id*="pass" i]',
-        ]:
-            if self._try_fill(ctx, sel, password): return True
+    def _fill_with(self, ctx, strategies, value: str, preferred=None):
+        """Tenta `preferred` (do cache) e depois a lista completa; devolve a estratégia vencedora."""
+        if preferred and self._apply_fill(ctx, preferred, value):
+            return preferred
+        for strategy in strategies:
+            if strategy != preferred and self._apply_fill(ctx, strategy, value):
+                return strategy
+        return None
 
+    def _fill_username(self, ctx, username: str, preferred=None):
+        log.debug("Tentando preencher o nome de usuário...")
+        won = self._fill_with(ctx, self._USERNAME_STRATEGIES, username, preferred)
+        if won:
+            log.debug(f"Usuário preenchido com sucesso ({won[0]}: {won[1]}).")
+        return won
+
+    def _fill_password(self, ctx, password: str, preferred=None):
+        log.debug("Tentando preencher a senha...")
+        won = self._fill_with(ctx, self._PASSWORD_STRATEGIES, password, preferred)
+        if won:
+            log.debug(f"Senha preenchida com sucesso ({won[0]}: {won[1]}).")
+        return won
+
+    def _apply_submit(self, ctx, strategy) -> bool:
+        kind, arg = strategy
+        try:
+            if kind == "click":
+                el = ctx.locator(arg).first
+                if el.count() > 0 and el.is_visible():
+                    el.click(timeout=6000)
+                    log.debug(f"Clique no seletor de login {arg} OK")
+                    return True
+            elif kind == "form_submit":
+                pwd = ctx.locator('#lgnCredencial_Password').first
+                if pwd.count() == 0:
+                    pwd = ctx.locator('input[type="password"]').first
+                if pwd.count() > 0:
+                    ctx.evaluate(
+                        """(el)=>{
+                            const f = el.form || el.closest('form');
+                            if (f) f.submit();
+                        }""",
+                        pwd
+                    )
+                    log.debug("Form.submit() disparado")
+                    return True
+            elif kind == "postback":
+                has_postback = ctx.evaluate("() => typeof window.__doPostBack === 'function'")
+                if has_postback:
+                    # tenta com o target do login comum
+                    ctx.evaluate("""() => { try { __doPostBack('lgnCredencial$LoginButton',''); } catch(e){} }""")
+                    log.debug("__doPostBack('lgnCredencial$LoginButton','')")
+                    return True
+            elif kind == "enter":
+                pwd = ctx.locator('input[type="password"]').first
+                if pwd.count() > 0:
+                    pwd.focus()
+                    # Frame não tem .keyboard; usa o da página dona
+                    keyboard = ctx.keyboard if hasattr(ctx, "keyboard") else ctx.page.keyboard
+                    keyboard.press("Enter")
+                    log.debug("Enter no campo de senha")
+                    return True
+        except Exception:
+            pass
         return False
 
-    def _click_or_submit_login(self, page_or_frame) -> bool:
+    def _click_or_submit_login(self, page_or_frame, preferred=None):
         """
-        1) Tenta clicar no botão padrão (#lgnCredencial_LoginButton).
+        1) Tenta clicar no botão padrão (#lgnCredencial_LoginButton) e alternativos.
         2) Se não rolar, tenta submeter o form pai do campo senha.
         3) Se for WebForms com __doPostBack, dispara ele manualmente.
+        4) Enter no campo senha.
+        Com `preferred` (do cache), tenta essa estratégia primeiro. Devolve a vencedora.
         """
         ctx = page_or_frame
-        print("[DEBUG] Tentando acionar o login...")
-
-        # 1) botão clássico
-        try:
-            btn = ctx.locator('#lgnCredencial_LoginButton')
-            if btn.count() > 0 and btn.is_visible():
-                btn.click(timeout=6000)
-                print("[DEBUG] Clique no botão de login (id) OK")
-                return True
-        except Exception:
-            pass
+        log.debug("Tentando acionar o login...")
+        if preferred and self._apply_submit(ctx, preferred):
+            return preferred
+        for strategy in self._SUBMIT_STRATEGIES:
+            if strategy != preferred and self._apply_submit(ctx, strategy):
+                return strategy
+        return None
 
-        # 1b) botões alternativos
-        for sel in [
-            'input[type="submit"]','input[type="image"]','button[type="submit"]',
-            'button:has-text("Entrar")','a:has-text("Entrar")',
-            'button:has-text("Acessar")','a:has-text("Acessar")',
-            '[id$="LoginButton"]','[name$="LoginButton"]',
-        ]:
-            try:
-                el = ctx.locator(sel).first
-                if el.count() > 0 and el.is_visible():
-                    el.click(timeout=6000)
-                    print(f"[DEBUG] Clique no seletor de login {sel} OK")
-                    return True
-            except Exception:
-                pass
+    # ---------------------- CACHE DE LOGIN ----------------------
+    @staticmethod
+    def _login_cache_key(login_url: str) -> str:
+        # ignora query (ex.: returnUrl) e fragmento: a tela de login é a mesma
+        u = urlsplit(login_url)
+        return f"{u.scheme}://{u.netloc.lower()}{u.path.rstrip('/')}"
 
-        # 2) submit do form (se existir)
+    def _load_login_cache(self) -> dict:
+        if not self.login_cache_path or not self.login_cache_path.exists():
+            return {}
         try:
-            pwd = ctx.locator('#lgnCredencial_Password').first
-            if pwd.count() == 0:
-                pwd = ctx.locator('input[type="password"]').first
-            if pwd.count() > 0:
-                ctx.evaluate(
-                    """(el)=>{
-                        const f = el.form || el.closest('form');
-                        if (f) f.submit();
-                    }""",
-                    pwd
-                )
-                print("[DEBUG] Form.submit() disparado")
-                return True
-        except Exception:
-            pass
-
-        # 3) __doPostBack (ASP.NET)
-        try:
-            has_postback = ctx.evaluate("() => typeof window.__doPostBack === 'function'")
-            if has_postback:
-                # tenta com o target do login comum
-                ctx.evaluate("""() => { try { __doPostBack('lgnCredencial$LoginButton',''); } catch(e){} }""")
-                print("[DEBUG] __doPostBack('lgnCredencial$LoginButton','')")
-                return True
-        except Exception:
-            pass
-
-        # 4) Enter no campo senha
+            with open(self.login_cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except Exception as e:
+            log.warning(f"Cache de login ignorado ({self.login_cache_path}): {e}")
+            return {}
+
+    def _remember_login(self, key: str, entry: dict):
+        if self._login_strategies.get(key) == entry:
+            return
+        self._login_strategies[key] = entry
+        if not self.login_cache_path:
+            return
         try:
-            pwd = ctx.locator('input[type="password"]').first
-            if pwd.count() > 0:
-                pwd.focus()
-                ctx.keyboard.press("Enter")
-                print("[DEBUG] Enter no campo de senha")
-                return True
-        except Exception:
-            pass
-
-        return False
+            with file_lock(self.login_cache_path):
+                # relê para não perder entradas gravadas por outros processos
+                merged = {**self._load_login_cache(), key: entry}
+                tmp = self.login_cache_path.with_suffix(".tmp")
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(merged, f, ensure_ascii=False, indent=2)
+                os.replace(tmp, self.login_cache_path)
+        except Exception as e:
+            log.warning(f"Falha ao gravar cache de login: {e}")
+
+    @staticmethod
+    def _frame_ref(page, ctx) -> Optional[dict]:
+        if ctx is page or ctx == page.main_frame:
+            return None
+        return {"name": ctx.name, "url": ctx.url}
+
+    @staticmethod
+    def _resolve_frame_ref(page, ref: Optional[dict]):
+        if not ref:
+            return page
+        for f in page.frames:
+            if ref.get("name") and f.name == ref["name"]:
+                return f
+        for f in page.frames:
+            if f.url == ref.get("url"):
+                return f
+        return None
 
-    def _perform_login(self, page, login_url: str, username: str, password: str):
-        print("[DEBUG] Ir para login:", login_url)
+    def _perform_login(self, page, login_url: str, username: str, password: str,
+                       debug_dir: Optional[Path] = None):
+        log.debug("Ir para login: %s", login_url)
         page.goto(login_url, wait_until="domcontentloaded")
-        self._save_html(page, "login_page")
+        self._save_html(page, "login_page", debug_dir)
 
-        def try_ctx(ctx) -> bool:
-            ok_user = self._fill_username(ctx, username)
-            ok_pass = self._fill_password(ctx, password)
-            if ok_user and ok_pass:
+        def try_ctx(ctx, cached: Optional[dict] = None) -> Optional[dict]:
+            cached = cached or {}
+            won_user = self._fill_username(ctx, username, _as_strategy(cached.get("username")))
+            won_pass = self._fill_password(ctx, password, _as_strategy(cached.get("password")))
+            if won_user and won_pass:
                 page.wait_for_timeout(250)
-                if self._click_or_submit_login(ctx):
-                    return True
-            return False
+                won_submit = self._click_or_submit_login(ctx, _as_strategy(cached.get("submit")))
+                if won_submit:
+                    return {
+                        "frame": self._frame_ref(page, ctx),
+                        "username": list(won_user),
+                        "password": list(won_pass),
+                        "submit": list(won_submit),
+                    }
+            return None
+
+        key = self._login_cache_key(login_url)
+        done = None
+        # caminho já conhecido para esta URL de login
+        cached = self._login_strategies.get(key)
+        if cached:
+            ctx = self._resolve_frame_ref(page, cached.get("frame"))
+            if ctx is not None:
+                log.debug("Usando estratégia de login em cache: %s", key)
+                try:
+                    done = try_ctx(ctx, cached)
+                except Exception:
+                    done = None
+            if not done:
+                log.debug("Estratégia em cache falhou; busca completa.")
 
         # tenta na página
-        done = try_ctx(page)
+        if not done:
+            done = try_ctx(page)
         # se não deu, tenta em iframes
         if not done:
             for f in page.frames:
                 if f == page.main_frame:
                     continue
                 try:
-                    if try_ctx(f):
-                        done = True
+                    done = try_ctx(f)
+                    if done:
                         break
                 except Exception:
                     continue
 
         # aguarda pós-login
+        # (o PBI faz polling, então um timeout aqui é normal; se o portal estiver fora,
+        # o relatório não carrega e o Runner trata o 'frame: not_found' como falha)
         try:
             page.wait_for_load_state("networkidle", timeout=30000)
-        except Exception:
-            pass
+        except Exception as e:
+            log.debug("networkidle pós-login não atingido: %s", e)
 
-        print("[DEBUG] URL após tentativa de login:", page.url)
+        log.debug("URL após tentativa de login: %s", page.url)
         # registra mensagem de erro se houver
+        failed = False
         try:
             msg = page.locator('#lgnCredencial_FailureText, .validation-summary-errors, [id*="FailureText"]').first
             if msg.count() > 0 and msg.is_visible():
-                print("[WARN] Mensagem de erro de login:", _norm(msg.inner_text()))
+                failed = True
+                log.warning("Mensagem de erro de login: %s", _norm(msg.inner_text()))
         except Exception:
             pass
 
+        # só memoriza caminhos que não terminaram em mensagem de erro
+        if done and not failed:
+            self._remember_login(key, done)
+
     # ---------------------- POWER BI FRAME ----------------------
-    def _find_pbi_frame(self, page):
-        targets = ("app.powerbi.com/reportembed", "powerbi", "report", "relatorio.aspx", "reportid=")
+    def _frame_rank(self, frame, targets, url_re) -> Optional[int]:
+        """Rank do frame para o predicado (0 = melhor); None se não casar."""
+        try:
+            if frame.is_detached():
+                return None
+            u = (frame.url or "").lower()
+        except Exception:
+            return None
+        if url_re is not None:
+            return 0 if url_re.search(u) else None
+        for i, t in enumerate(targets):
+            if t in u:
+                return i
+        return None
+
+    def _ranked_frames(self, found: dict) -> list:
+        """
+        Ordena os frames encontrados e descarta os 'wrappers' (frames que casam
+        mas têm um descendente que também casa, ex.: relatorio.aspx -> reportEmbed).
+        """
+        def ancestors(f):
+            out, cur = [], f.parent_frame
+            while cur is not None:
+                out.append(cur)
+                cur = cur.parent_frame
+            return out
+
+        wrappers = set()
+        for f in found:
+            wrappers.update(a for a in ancestors(f) if a in found)
+        leaves = [f for f in found if f not in wrappers]
+        order = list(found)
+        return sorted(leaves, key=lambda f: (found[f], -len(ancestors(f)), order.index(f)))
+
+    def _wait_for_pbi_frames(self, page, extra: dict) -> list:
+        """
+        Descobre os iframes do Power BI por eventos (frameattached/framenavigated),
+        inclusive aninhados, seguindo assim que o embed carregar.
+        Config (req.extra):
+          - frame_match: lista de trechos de URL (default: _PBI_TARGETS)
+          - frame_url_regex: regex de URL (substitui frame_match)
+          - frame_timeout_ms: tempo máximo de espera (default 20000)
+          - frame_count: nº mínimo de embeds esperados (default 1)
+          - frame_settle_ms: espera extra por um embed mais específico quando um
+            iframe só casou um termo genérico (default 2000). O frame principal da
+            página (ex.: relatorio.aspx) não conta: com ele só, espera o timeout todo
+        Sem nenhum frame por URL, cai na varredura de <iframe> do DOM (_find_pbi_frame).
+        """
+        targets = tuple(t.lower() for t in (extra.get("frame_match") or _PBI_TARGETS))
+        url_re = re.compile(extra["frame_url_regex"], re.I) if extra.get("frame_url_regex") else None
+        timeout_ms = int(extra.get("frame_timeout_ms", 20000))
+        settle_ms = int(extra.get("frame_settle_ms", 2000))
+        min_count = max(1, int(extra.get("frame_count", 1)))
+
+        found: dict = {}  # frame -> rank (dict preserva a ordem de descoberta)
+
+        def on_frame(frame):
+            rank = self._frame_rank(frame, targets, url_re)
+            if rank is None:
+                found.pop(frame, None)  # navegou para fora do embed
+            else:
+                found[frame] = rank
+
+        def on_detached(frame):
+            found.pop(frame, None)
+
+        page.on("frameattached", on_frame)
+        page.on("framenavigated", on_frame)
+        page.on("framedetached", on_detached)
+        try:
+            for f in page.frames:
+                on_frame(f)
+            deadline = time.monotonic() + timeout_ms / 1000
+            settle_until = None
+            while True:
+                ranked = self._ranked_frames(found)
+                if sum(1 for f in ranked if found[f] == 0) >= min_count:
+                    break
+                now = time.monotonic()
+                # o settle só vale para iframes; a página em si não é o embed
+                if sum(1 for f in ranked if f.parent_frame is not None) >= min_count:
+                    if settle_until is None:
+                        settle_until = now + settle_ms / 1000
+                    if now >= settle_until:
+                        break
+                remaining = min(deadline, settle_until or deadline) - now
+                if remaining <= 0:
+                    break
+                try:
+                    page.wait_for_event("framenavigated", timeout=remaining * 1000)
+                except PWTimeoutError:
+                    pass
+                except Exception:
+                    break  # página fechada/navegação abortada
+        finally:
+            page.remove_listener("frameattached", on_frame)
+            page.remove_listener("framenavigated", on_frame)
+            page.remove_listener("framedetached", on_detached)
+
+        ranked = self._ranked_frames(found)
+        if ranked:
+            return ranked
+        fallback = self._find_pbi_frame(page, targets, url_re)
+        return [fallback] if fallback else []
+
+    def _frame_with_tab(self, frames: list, tab: str):
+        """Com vários embeds, usa o primeiro que contém a aba; senão, o principal."""
+        if len(frames) > 1:
+            for f in frames:
+                try:
+                    if f.locator(f'[aria-label="{tab}"], [title="{tab}"], :text("{tab}")').count() > 0:
+                        return f
+                except Exception:
+                    continue
+        return frames[0]
+
+    def _find_pbi_frame(self, page, targets=_PBI_TARGETS, url_re=None):
+        # mesmo predicado da descoberta por eventos: com frame_url_regex, só a regex vale
+        def matches(text: str) -> bool:
+            if url_re is not None:
+                return bool(url_re.search(text))
+            return any(t in text for t in targets)
+
         # 1) varre frames por URL
         for f in page.frames:
             try:
                 u = (f.url or "").lower()
-                if any(t in u for t in targets):
+                if matches(u):
                     return f
             except Exception:
                 continue
@@ -283,7 +499,7 @@ class PlaywrightCollector(Collector):
                 try:
                     src = (el.get_attribute("src") or "").lower()
                     tit = (el.get_attribute("title") or "").lower()
-                    if any(t in src for t in targets) or any(t in tit for t in targets):
+                    if matches(src) or (url_re is None and matches(tit)):
                         cf = el.content_frame()
                         if cf: 
                             return cf
@@ -370,151 +586,371 @@ class PlaywrightCollector(Collector):
                                   timeout=30000)
             headers, rows = self._extract_table_like(ctx)
             if not rows and not headers:
-                print(f"[WARN] Nada tabular visível para '{tab_name}'.")
+                log.warning(f"Nada tabular visível para '{tab_name}'.")
                 return False
 
             out_csv.parent.mkdir(parents=True, exist_ok=True)
-            with open(out_csv, "w", newline="", encoding="utf-8") as fp:
-                writer = csv.writer(fp)
-                if headers:
-                    writer.writerow(headers)
-                writer.writerows(rows)
-
-            print(f"[OK] CSV gerado para '{tab_name}': {out_csv.resolve()}")
+            with file_lock(out_csv):
+                tmp = out_csv.with_suffix(out_csv.suffix + ".tmp")
+                with open(tmp, "w", newline="", encoding="utf-8") as fp:
+                    writer = csv.writer(fp)
+                    if headers:
+                        writer.writerow(headers)
+                    writer.writerows(rows)
+                os.replace(tmp, out_csv)
+
+            log.info(f"CSV gerado para '{tab_name}': {out_csv.resolve()}")
             return True
 
         except PWTimeoutError:
-            print(f"[ERRO] Timeout aguardando tabela/visual para '{tab_name}'.")
+            log.error(f"Timeout aguardando tabela/visual para '{tab_name}'.")
             return False
         except Exception as e:
-            print(f"[ERRO] Falha na extração para '{tab_name}': {e}")
+            log.error(f"Falha na extração para '{tab_name}': {e}")
+            return False
+
+    # ---------------------- SLICERS ----------------------
+    # hash do texto dos visuais, calculado no próprio frame (evita trafegar o texto)
+    _SIGNATURE_FN = """function () {
+        const els = document.querySelectorAll('[role="grid"], [role="table"], [data-automationid="visualContainer"]');
+        let h = 0;
+        for (const el of els) {
+            const t = el.innerText || "";
+            for (let i = 0; i < t.length; i++) { h = ((h << 5) - h + t.charCodeAt(i)) | 0; }
+        }
+        return String(h) + ":" + els.length;
+    }"""
+    _VISUAL_SIGNATURE_JS = f"() => ({_SIGNATURE_FN})()"
+    # pronto = sem spinner e com assinatura diferente da anterior ao filtro
+    _VISUALS_REFRESHED_JS = f"""(before) => {{
+        if (document.querySelector('[aria-busy="true"], .spinner, .circle.loading')) return false;
+        return ({_SIGNATURE_FN})() !== before;
+    }}"""
+
+    @staticmethod
+    def _slicer_combinations(slicers) -> list[list[tuple[str, str]]]:
+        """
+        extra.slicers: {nome: [valores]} ou [{name, values}] -> produto cartesiano,
+        como listas de (nome, valor). O último slicer varia mais rápido, então
+        combinações consecutivas mudam o mínimo de slicers.
+        """
+        if not slicers:
+            return []
+        if isinstance(slicers, dict):
+            slicers = [{"name": k, "values": v} for k, v in slicers.items()]
+        names, values = [], []
+        for s in slicers:
+            if not s.get("name") or not s.get("values"):
+                raise ValueError(f"slicer inválido (esperado name/values): {s!r}")
+            names.append(str(s["name"]))
+            values.append([str(v) for v in s["values"]])
+        return [list(zip(names, combo)) for combo in itertools.product(*values)]
+
+    @staticmethod
+    def _combination_name(combo: list[tuple[str, str]]) -> str:
+        raw = "_".join(f"{name}={value}" for name, value in combo)
+        return re.sub(r"[^\w=.-]+", "-", raw, flags=re.UNICODE).strip("-")
+
+    def _visual_signature(self, frame) -> Optional[str]:
+        try:
+            return frame.evaluate(self._VISUAL_SIGNATURE_JS)
+        except Exception:
+            return None
+
+    def _wait_visuals_refresh(self, frame, before: Optional[str], timeout_ms: int) -> bool:
+        """Espera os visuais re-renderizarem (sem spinner e com conteúdo diferente de `before`)."""
+        try:
+            frame.wait_for_function(self._VISUALS_REFRESHED_JS, arg=before, timeout=timeout_ms)
+            return True
+        except Exception:
+            # mesmo dado para os dois valores (ou visual lento): segue com o que estiver na tela
             return False
 
+    def _apply_slicer(self, frame, name: str, value: str) -> bool:
+        """
+        Seleciona `value` no slicer `name` (lista ou dropdown) dentro do frame já carregado.
+        Devolve True se clicou (os visuais vão atualizar), False se já estava selecionado.
+        """
+        container = None
+        for sel in (
+            f'.slicer-container:has(.slicer-header-text[title="{name}"])',
+            f'[data-automationid="visualContainer"]:has([title="{name}"]):has(.slicer-container)',
+            f'.visualContainer:has([aria-label="{name}"]):has(.slicer-container)',
+        ):
+            loc = frame.locator(sel).first
+            if loc.count() > 0:
+                container = loc
+                break
+        if container is None:
+            raise RuntimeError(f"slicer '{name}' não encontrado")
+
+        # dropdown: abre o menu (as opções aparecem num popup fora do container)
+        dropdown = container.locator(".slicer-dropdown-menu").first
+        if dropdown.count() > 0 and dropdown.get_attribute("aria-expanded") != "true":
+            dropdown.click(timeout=5000)
+
+        option_sel = f'.slicerItemContainer[title="{value}"], [role="option"][title="{value}"]'
+        option = container.locator(option_sel).first
+        if option.count() == 0:
+            option = frame.locator(f'.slicer-dropdown-popup >> {option_sel}').first
+        option.wait_for(state="visible", timeout=10000)
+        already = option.get_attribute("aria-selected") == "true" or option.get_attribute("aria-checked") == "true"
+        if not already:
+            option.click(timeout=10000)
+        if dropdown.count() > 0:
+            try:
+                frame.page.keyboard.press("Escape")
+            except Exception:
+                pass
+        return not already
+
+    def _extract_slicer_combinations(self, page, frame, combos, export_dir: Path, prefix: str,
+                                     debug_dir: Path, settle_ms: int) -> dict:
+        """
+        Aplica cada combinação de slicers no frame já carregado (sem recarregar
+        o relatório) e extrai a tabela para '<prefix>__<combinação>.csv'
+        (ou '<combinação>.csv' sem prefixo). Só reaplica os slicers que mudaram.
+        """
+        applied: dict = {}
+        done, failures = 0, []
+        for combo in combos:
+            combo_name = self._combination_name(combo)
+            try:
+                before = self._visual_signature(frame)
+                changed = False
+                for name, value in combo:
+                    if applied.get(name) != value:
+                        # já selecionado (ex.: estado inicial do relatório): nada a esperar
+                        if self._apply_slicer(frame, name, value):
+                            changed = True
+                        applied[name] = value
+                if changed:
+                    self._wait_visuals_refresh(frame, before, settle_ms)
+                out_name = f"{prefix}__{combo_name}" if prefix else combo_name
+                if self._extract_table_to_csv(frame, export_dir / f"{out_name}.csv", out_name):
+                    done += 1
+                else:
+                    failures.append(combo_name)
+            except Exception as e:
+                log.error(f"Falha ao aplicar slicers '{combo_name}': {e}")
+                self._save_html(page, f"erro_slicer_{combo_name}", debug_dir)
+                failures.append(combo_name)
+                applied.clear()  # estado dos slicers incerto: reaplica tudo na próxima
+        return {"combinations": len(combos), "extracted": done, "failed": failures}
+
     # ---------------------- MERGE CSV -> EXCEL ----------------------
-    def merge_exports_to_xlsx(self, out_xlsx: str) -> str:
-        if pd is None:
-            raise RuntimeError("Pandas não encontrado. Instale: pip install pandas openpyxl")
-        csv_paths = glob.glob(str(self.export_dir / "*.csv"))
+    def merge_exports_to_xlsx(self, out_xlsx: str, export_dir: Optional[Path] = None) -> str:
+        export_dir = export_dir or self.export_dir
+        csv_paths = sorted(export_dir.glob("*.csv"))
         if not csv_paths:
-            raise RuntimeError(f"Nenhum CSV encontrado em: {self.export_dir.resolve()}")
-        tmp = out_xlsx + ".tmp"
-        with pd.ExcelWriter(tmp, engine="openpyxl", mode="w") as writer:
-            for path in csv_paths:
-                sheet = Path(path).stem[:31]
-                try:
-                    df = pd.read_csv(path, encoding="utf-8")
-                    df.to_excel(writer, index=False, sheet_name=sheet)
-                except Exception as e:
-                    print(f"[WARN] falha ao escrever '{sheet}': {e}")
-        if os.path.exists(out_xlsx):
-            try: os.remove(out_xlsx)
-            except Exception: pass
-        os.replace(tmp, out_xlsx)
-        print(f"[EXPORT] Excel gerado: {Path(out_xlsx).resolve()}")
-        return out_xlsx
+            raise RuntimeError(f"Nenhum CSV encontrado em: {export_dir.resolve()}")
+        return merge_csvs_to_xlsx([(p.stem, str(p)) for p in csv_paths], out_xlsx)
 
     # ---------------------- COLLECT ----------------------
+    def _export_paths(self, extra: dict) -> tuple[Path, str]:
+        excel_name = extra.get("excel_name") or "powerbi_export.xlsx"
+        # diretório por task/execução (definido pelo Runner); sem ele, layout legado
+        if extra.get("export_dir"):
+            export_dir = Path(extra["export_dir"])
+            out_xlsx_path = str(export_dir / excel_name)
+        else:
+            export_dir = self.export_dir
+            out_xlsx_path = str(Path("exports") / excel_name)
+        export_dir.mkdir(parents=True, exist_ok=True)
+        return export_dir, out_xlsx_path
+
     def collect(self, req: CollectRequest) -> CollectResponse:
+        resp = self.collect_many([req])[0]
+        if isinstance(resp, Exception):
+            raise resp
+        return resp
+
+    def _session_key(self, req: CollectRequest) -> tuple:
+        """Requests com a mesma chave podem dividir um login (mesma conta, mesmo portal)."""
+        extra = req.extra or {}
+        use_return_url = bool(extra.get("use_return_url", False))
+        return (
+            extra.get("login_url", "https://patrezeseguros.metainfo.com.br/login"),
+            extra.get("username") or os.getenv("USERNAME"),
+            extra.get("password") or os.getenv("PASSWORD"),
+            use_return_url,
+            req.source if use_return_url else None,  # o returnUrl entra na URL de login
+        )
+
+    def collect_many(self, reqs: list[CollectRequest]) -> list:
+        """
+        Coleta vários relatórios com um navegador só. Requests com as mesmas
+        credenciais/login (_session_key) dividem uma sessão: um login, uma página;
+        credenciais diferentes (ex.: matrix por cliente) ganham sessões isoladas.
+        Cada request gera seu próprio CollectResponse (ou a exceção, se aquele
+        relatório ou o login da sua sessão falhar).
+        """
         if sync_playwright is None:
             raise RuntimeError("Playwright não está instalado no ambiente.")
-        extra = req.extra or {}
-        username = extra.get("username") or os.getenv("USERNAME")
-        password = extra.get("password") or os.getenv("PASSWORD")
+        sessions: dict = {}  # chave -> índices dos requests (na ordem de entrada)
+        for i, req in enumerate(reqs):
+            sessions.setdefault(self._session_key(req), []).append(i)
+
+        results: list = [None] * len(reqs)
+        with sync_playwright() as p:
+            browser = p.chromium.launch(headless=self.headless, slow_mo=120 if not self.headless else 0)
+            try:
+                for key, idxs in sessions.items():
+                    group = [reqs[i] for i in idxs]
+                    try:
+                        out = self._collect_session(browser, key, group)
+                    except Exception as e:
+                        log.error(f"Falha na sessão de '{key[0]}' ({len(group)} relatório(s)): {e}")
+                        out = [e] * len(group)
+                    for i, r in zip(idxs, out):
+                        results[i] = r
+            finally:
+                browser.close()
+        return results
+
+    def _collect_session(self, browser, key: tuple, reqs: list[CollectRequest]) -> list:
+        login_url_base, username, password, use_return_url, return_source = key
         if not username or not password:
             raise RuntimeError("Credenciais ausentes.")
-
-        login_url_base = extra.get("login_url", "https://patrezeseguros.metainfo.com.br/login")
-        use_return_url = bool(extra.get("use_return_url", False))
-        wait_until = extra.get("wait_until", "domcontentloaded")
-        wait_ms = int(extra.get("wait_ms", 6000))
-        nav_timeout_ms = int(extra.get("nav_timeout_ms", 60000))
-        merge_to_excel = bool(extra.get("merge_to_excel", True))
-        excel_name = extra.get("excel_name") or "powerbi_export.xlsx"
-        tabs_to_extract = extra.get("tabs_to_extract", [])
-        out_xlsx_path = str(Path("exports") / excel_name)
+        export_dir, _ = self._export_paths(reqs[0].extra or {})
 
         login_url = login_url_base
         if use_return_url:
             sep = "&" if "?" in login_url_base else "?"
-            login_url = f"{login_url_base}{sep}returnUrl={quote(req.source, safe='')}"
+            login_url = f"{login_url_base}{sep}returnUrl={quote(return_source, safe='')}"
 
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=self.headless, slow_mo=120 if not self.headless else 0)
-            context = browser.new_context(accept_downloads=True)
+        results: list = []
+        # contexto próprio por sessão: cookies/login não vazam entre contas
+        context = browser.new_context(accept_downloads=True)
+        try:
             page = context.new_page()
             page.set_default_timeout(max(self.default_timeout_ms, 15000))
 
-            # 1) login
-            self._perform_login(page, login_url=login_url, username=username, password=password)
+            # 1) login (uma vez para a sessão toda)
+            self._perform_login(page, login_url=login_url, username=username, password=password,
+                                debug_dir=export_dir / "debug")
 
+            current_source = None
+            for req in reqs:
+                try:
+                    resp = self._collect_report(page, req, reuse_page=req.source == current_source)
+                    resp.meta["used_return_url"] = use_return_url
+                    resp.meta["session_size"] = len(reqs)
+                    results.append(resp)
+                    # slicers aplicados ficam selecionados na página: a próxima variante
+                    # recarrega o relatório para não extrair dados filtrados
+                    current_source = None if (req.extra or {}).get("slicers") else req.source
+                except Exception as e:
+                    log.error(f"Falha ao coletar '{req.source}': {e}")
+                    results.append(e)
+                    current_source = None
+        finally:
+            context.close()
+        return results
+
+    def _collect_report(self, page, req: CollectRequest, reuse_page: bool = False) -> CollectResponse:
+        extra = req.extra or {}
+        wait_until = extra.get("wait_until", "domcontentloaded")
+        wait_ms = int(extra.get("wait_ms", 6000))
+        nav_timeout_ms = int(extra.get("nav_timeout_ms", 60000))
+        merge_to_excel = bool(extra.get("merge_to_excel", True))
+        tabs_to_extract = extra.get("tabs_to_extract", [])
+        need_content = bool(extra.get("need_content", True))
+        combos = self._slicer_combinations(extra.get("slicers"))
+        slicer_settle_ms = int(extra.get("slicer_settle_ms", 8000))
+        export_dir, out_xlsx_path = self._export_paths(extra)
+        debug_dir = export_dir / "debug"
+        slicer_stats = []
+        nav_error = None
+
+        if reuse_page:
+            # mesmo relatório da variante anterior: reaproveita a página já carregada
+            log.debug("reaproveitando relatório já aberto: %s", req.source)
+        else:
             # não saia cedo; alguns ambientes mantêm a URL igual, mas setam cookie
             # então tente ir ao relatório de qualquer forma
-            print("[DEBUG] tentando abrir relatório:", req.source)
+            log.debug("tentando abrir relatório: %s", req.source)
             try:
                 page.goto(req.source, wait_until=wait_until, timeout=nav_timeout_ms)
             except Exception as e:
-                print(f"[ERRO] Falha ao acessar relatório: {e}")
-                self._save_html(page, "erro_navegacao_relatorio")
-
-            # 2) iframe do Power BI
-            pbi_frame = self._find_pbi_frame(page)
-            if not pbi_frame:
-                print("[WARN] Não foi possível localizar o iframe do Power BI.")
-                self._save_html(page, "erro_frame")
-                html = page.content()
-                context.close(); browser.close()
-                return CollectResponse(raw=html, extracted=None,
-                    meta={"engine": "playwright", "excel_path": None, "frame": "not_found"})
-
-            # 3) extração
-            # se nenhuma aba foi informada, tenta extrair a tabela visível atual
-            if not tabs_to_extract:
-                self._extract_table_to_csv(pbi_frame, self.export_dir / "PaginaAtual.csv", "PaginaAtual")
-            else:
-                for tab in tabs_to_extract:
-                    print(f"[INFO] Processando aba: '{tab}'")
-                    try:
-                        # tenta achar o botão/aba por vários atributos/rotulos
-                        loc = pbi_frame.locator(
-                            f'[aria-label="{tab}"], [title="{tab}"], [data-tooltip-content="{tab}"]'
-                        )
-                        if loc.count() == 0:
-                            loc = pbi_frame.locator(f'text="{tab}"').first
-                        loc.wait_for(state="visible", timeout=15000)
-                        loc.click(timeout=10000)
-                        # aguarda render
-                        try: pbi_frame.wait_for_load_state("domcontentloaded", timeout=8000)
-                        except Exception: pass
-
-                        out_csv = self.export_dir / f"{tab.replace(' ', '_')}.csv"
-                        self._extract_table_to_csv(pbi_frame, out_csv, tab)
-                    except PWTimeoutError:
-                        print(f"[ERRO] Timeout no botão/aba '{tab}'.")
-                        self._save_html(page, f"erro_{tab}")
-                    except Exception as e:
-                        print(f"[ERRO] Falha ao processar a aba '{tab}': {e}")
-                        self._save_html(page, f"erro_{tab}")
-
-            excel_path = None
-            if merge_to_excel:
+                nav_error = e
+                log.error(f"Falha ao acessar relatório: {e}")
+                self._save_html(page, "erro_navegacao_relatorio", debug_dir)
+
+        # 2) iframe(s) do Power BI
+        pbi_frames = self._wait_for_pbi_frames(page, extra)
+        if not pbi_frames:
+            log.warning("Não foi possível localizar o iframe do Power BI.")
+            self._save_html(page, "erro_frame", debug_dir)
+            html = Payload.of(page.content()) if need_content else None
+            # o Runner trata 'not_found' como falha transitória (retry + circuit breaker)
+            return CollectResponse(raw=html, extracted=None,
+                meta={"engine": "playwright", "excel_path": None, "frame": "not_found",
+                      "nav_error": str(nav_error) if nav_error else None})
+
+        log.debug(f"{len(pbi_frames)} frame(s) Power BI: " + ", ".join(f.url for f in pbi_frames))
+
+        # 3) extração
+        # com slicers, cada combinação é aplicada no próprio frame e vira um CSV
+        def extract(frame, name: str, is_default: bool):
+            if not combos:
+                self._extract_table_to_csv(frame, export_dir / f"{name}.csv", name)
+                return
+            stats = self._extract_slicer_combinations(
+                page, frame, combos, export_dir, "" if is_default else name, debug_dir, slicer_settle_ms)
+            slicer_stats.append({"target": name, **stats})
+
+        # se nenhuma aba foi informada, tenta extrair a tabela visível atual (de cada embed)
+        if not tabs_to_extract:
+            for i, frame in enumerate(pbi_frames):
+                name = "PaginaAtual" if i == 0 else f"PaginaAtual_{i + 1}"
+                extract(frame, name, is_default=i == 0)
+        else:
+            for tab in tabs_to_extract:
+                log.info(f"Processando aba: '{tab}'")
                 try:
-                    excel_path = self.merge_exports_to_xlsx(out_xlsx=out_xlsx_path)
+                    pbi_frame = self._frame_with_tab(pbi_frames, tab)
+                    # tenta achar o botão/aba por vários atributos/rotulos
+                    loc = pbi_frame.locator(
+                        f'[aria-label="{tab}"], [title="{tab}"], [data-tooltip-content="{tab}"]'
+                    )
+                    if loc.count() == 0:
+                        loc = pbi_frame.locator(f'text="{tab}"').first
+                    loc.wait_for(state="visible", timeout=15000)
+                    loc.click(timeout=10000)
+                    # aguarda render
+                    try: pbi_frame.wait_for_load_state("domcontentloaded", timeout=8000)
+                    except Exception: pass
+
+                    extract(pbi_frame, tab.replace(' ', '_'), is_default=False)
+                except PWTimeoutError:
+                    log.error(f"Timeout no botão/aba '{tab}'.")
+                    self._save_html(page, f"erro_{tab}", debug_dir)
                 except Exception as e:
-                    print("[WARN] merge_to_excel falhou:", e)
+                    log.error(f"Falha ao processar a aba '{tab}': {e}")
+                    self._save_html(page, f"erro_{tab}", debug_dir)
+
+        excel_path = None
+        if merge_to_excel:
+            try:
+                excel_path = self.merge_exports_to_xlsx(out_xlsx=out_xlsx_path, export_dir=export_dir)
+            except Exception as e:
+                log.warning("merge_to_excel falhou: %s", e)
 
-            if wait_ms:
-                page.wait_for_timeout(wait_ms)
+        if wait_ms:
+            page.wait_for_timeout(wait_ms)
 
-            html = page.content()
-            context.close(); browser.close()
+        # page.content() só quando alguém vai extrair do HTML
+        html = Payload.of(page.content()) if need_content else None
 
         return CollectResponse(
             raw=html,
             extracted=None,
             meta={
                 "engine": "playwright",
-                "used_return_url": use_return_url,
-                "export_dir": str(self.export_dir.resolve()),
+                "export_dir": str(export_dir.resolve()),
+                "frames": len(pbi_frames),
                 "excel_path": excel_path,
+                **({"slicers": slicer_stats} if combos else {}),
             },
         )
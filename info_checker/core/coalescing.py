@@ -0,0 +1,160 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .models import CollectRequest
+from .payload import release
+
+# chaves de extra que só dizem respeito à task (não mudam o que é baixado)
+_PER_TASK_EXTRA = ("export_dir", "need_content", "coalesce")
+
+
+def fingerprint(collector: str, req: CollectRequest) -> str:
+    extra = {k: v for k, v in (req.extra or {}).items() if k not in _PER_TASK_EXTRA}
+    key = {"collector": collector, "source": req.source, "method": (req.method or "GET").upper(),
+           "selector": req.selector, "extra": extra}
+    return hashlib.sha1(json.dumps(key, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class SharedResult:
+    """
+    Uma coleta compartilhada entre tasks: a resposta e o HTML parseado,
+    calculado uma vez só, sob demanda (regex roda direto no Payload).
+    """
+
+    def __init__(self, key: str, owner_task: str):
+        self.key = key
+        self.owner_task = owner_task
+        self.response = None
+        self.error: Optional[BaseException] = None
+        self.served = 0           # tasks atendidas sem nova coleta
+        self.done_at: Optional[float] = None
+        self.readers = 0          # tasks que ainda estão lendo (get_or_collect sem release)
+        self.evicted = False
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._docs: Dict[str, Any] = {}
+
+    def _doc(self, name: str, build: Callable[[], Any]) -> Any:
+        with self._lock:
+            if name not in self._docs:
+                self._docs[name] = build()
+            return self._docs[name]
+
+    def soup(self):
+        from ..collectors.http_requests import parse_html
+        return self._doc("soup", lambda: parse_html(self.response.raw))
+
+    def close(self):
+        if self.response is not None:
+            release(self.response.raw)
+        self._docs.clear()
+
+
+class RequestCoalescer:
+    """
+    Junta coletas idênticas (mesmo fingerprint) de um run: a primeira task coleta,
+    as concorrentes esperam a mesma coleta em andamento, e as seguintes reaproveitam
+    o resultado por até `ttl_s` segundos. Guarda no máximo `max_entries` (LRU).
+    Falhas não ficam em cache: só quem esperava a coleta que falhou recebe o erro.
+    Quem recebe um resultado deve chamar `release(entry)` ao terminar de ler: um
+    resultado expirado/removido só é fechado quando ninguém mais o está lendo.
+    Com `expect()` (nº de tasks por fingerprint no run), o resultado sai do cache
+    assim que todas as tasks esperadas o leram, sem esperar TTL/LRU.
+    """
+
+    def __init__(self, ttl_s: float = 60.0, max_entries: int = 64, clock=time.monotonic):
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, SharedResult]" = OrderedDict()
+        self._expected: Dict[str, int] = {}   # fingerprint -> nº de tasks que vão pedi-lo
+        self._consumed: Dict[str, int] = {}
+
+    def expect(self, counts: Dict[str, int]):
+        with self._lock:
+            self._expected = dict(counts)
+            self._consumed = {}
+
+    def wants(self, key: str) -> bool:
+        return key in self._expected
+
+    def _retire(self, entry: SharedResult):
+        # chamado sob self._lock
+        entry.evicted = True
+        if entry.readers == 0:
+            entry.close()
+
+    def _expire(self):
+        now = self.clock()
+        for key, e in list(self._entries.items()):
+            if e.done_at is not None and now - e.done_at > self.ttl_s:
+                self._retire(self._entries.pop(key))
+
+    def _trim(self):
+        done = [k for k, e in self._entries.items() if e.done_at is not None]
+        while len(self._entries) > self.max_entries and done:
+            self._retire(self._entries.pop(done.pop(0)))
+
+    def get_or_collect(self, key: str, task_id: str, collect: Callable[[], Any]) -> Tuple[SharedResult, bool]:
+        """Devolve (resultado compartilhado, True se veio de outra task)."""
+        with self._lock:
+            self._expire()
+            entry = self._entries.get(key)
+            owner = entry is None
+            if owner:
+                entry = self._entries[key] = SharedResult(key, task_id)
+            else:
+                entry.served += 1
+                self._entries.move_to_end(key)
+            entry.readers += 1
+            self._consumed[key] = self._consumed.get(key, 0) + 1
+            self._trim()
+
+        if owner:
+            try:
+                entry.response = collect()
+            except BaseException as e:
+                entry.error = e
+                with self._lock:
+                    self._entries.pop(key, None)
+            finally:
+                entry.done_at = self.clock()
+                entry._ready.set()
+        else:
+            entry._ready.wait()
+
+        if entry.error is not None:
+            self.release(entry)
+            raise entry.error
+        return entry, not owner
+
+    def release(self, entry: SharedResult):
+        """Fim da leitura de um resultado; fecha-o se já saiu do cache e era o último leitor."""
+        with self._lock:
+            entry.readers -= 1
+            key = entry.key
+            if key in self._expected and self._consumed.get(key, 0) >= self._expected[key] and not entry.evicted:
+                # todas as tasks esperadas já pegaram o resultado: sai do cache
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+                entry.evicted = True
+            if entry.readers == 0 and entry.evicted:
+                entry.close()
+
+    def clear(self):
+        with self._lock:
+            for e in self._entries.values():
+                self._retire(e)
+            self._entries.clear()
+
+
+def coalescer_from_cfg(cfg: Optional[Dict[str, Any]]) -> Optional[RequestCoalescer]:
+    cfg = cfg or {}
+    if not cfg.get("enabled", True):
+        return None
+    return RequestCoalescer(ttl_s=float(cfg.get("ttl_s", 60.0)), max_entries=int(cfg.get("max_entries", 64)))
@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from typing import List, Union
 from .models import CollectRequest, CollectResponse
 
 class Collector(ABC):
@@ -6,6 +7,21 @@ class Collector(ABC):
     def collect(self, req: CollectRequest) -> CollectResponse:
         ...
 
+    def collect_many(self, reqs: List[CollectRequest]) -> List[Union[CollectResponse, Exception]]:
+        """
+        Coleta um grupo de requests (variantes de uma mesma task).
+        Default: um collect() por request. Coletores com sessão cara (login,
+        navegador) sobrescrevem para compartilhá-la entre o grupo.
+        A falha de um request vira a exceção na sua posição, sem derrubar os demais.
+        """
+        out: List[Union[CollectResponse, Exception]] = []
+        for req in reqs:
+            try:
+                out.append(self.collect(req))
+            except Exception as e:
+                out.append(e)
+        return out
+
 class Extractor(ABC):
     @abstractmethod
     def extract(self, raw: any, extraction_cfg: dict) -> str:
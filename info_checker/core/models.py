@@ -27,3 +27,4 @@ class Task:
     request: CollectRequest
     extraction: Dict[str, Any]  # {strategy: "css"|"xpath"|"regex", path/pattern}
     rules: List[ValidationRule]
+    group: Optional[str] = None  # tasks expandidas de um mesmo template (matrix) compartilham sessão
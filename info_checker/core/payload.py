@@ -0,0 +1,170 @@
+import io
+import mmap
+import re
+import tempfile
+from contextlib import contextmanager
+from typing import Any, Optional, Union
+
+# acima disso o conteúdo vai para um arquivo temporário
+DEFAULT_MAX_MEMORY = 1024 * 1024
+
+
+class _ViewReader(io.RawIOBase):
+    """Stream somente-leitura sobre um buffer (memoryview), sem copiá-lo inteiro."""
+
+    def __init__(self, view):
+        self._view = view
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, b):
+        n = max(0, min(len(b), len(self._view) - self._pos))
+        b[:n] = self._view[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: len(self._view)}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+
+class Payload:
+    """
+    Conteúdo bruto de uma coleta (html/texto/bytes).
+    Fica em memória enquanto for pequeno; ao passar de `max_memory` bytes é
+    despejado em um arquivo temporário. A leitura é sob demanda: text() /
+    read_bytes() carregam tudo, open() e view() permitem ler por streaming.
+    """
+
+    def __init__(self, encoding: str = "utf-8", max_memory: int = DEFAULT_MAX_MEMORY):
+        self.encoding = encoding
+        self.max_memory = max_memory
+        self._buf = io.BytesIO()
+        self._file = None  # arquivo temporário (quando despejado)
+        self.size = 0
+
+    @classmethod
+    def of(cls, data: Union[str, bytes], encoding: str = "utf-8", max_memory: int = DEFAULT_MAX_MEMORY):
+        p = cls(encoding=encoding, max_memory=max_memory)
+        p.write(data)
+        return p
+
+    @property
+    def spilled(self) -> bool:
+        return self._file is not None
+
+    def write(self, chunk: Union[str, bytes]):
+        if isinstance(chunk, str):
+            chunk = chunk.encode(self.encoding)
+        if self._file is None and self.size + len(chunk) > self.max_memory:
+            self._file = tempfile.TemporaryFile(prefix="info_checker_")
+            self._file.write(self._buf.getbuffer())
+            self._buf = None
+        if self._file is not None:
+            self._file.seek(0, io.SEEK_END)
+        (self._file or self._buf).write(chunk)
+        self.size += len(chunk)
+
+    @contextmanager
+    def open(self):
+        """Stream binário do início do conteúdo (para parsers que aceitam arquivo)."""
+        if self._file is None:
+            with self.view() as mv:
+                reader = _ViewReader(mv)
+                try:
+                    yield reader
+                finally:
+                    reader._view = memoryview(b"")
+        else:
+            self._file.flush()
+            self._file.seek(0)
+            yield self._file
+
+    @contextmanager
+    def view(self):
+        """Buffer sem cópia: memoryview (em memória) ou mmap (em disco)."""
+        if self._file is None or self.size == 0:
+            mv = self._buf.getbuffer() if self._buf is not None else memoryview(b"")
+            try:
+                yield mv
+            finally:
+                mv.release()
+            return
+        self._file.flush()
+        mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield mm
+        finally:
+            mm.close()
+
+    def read_bytes(self) -> bytes:
+        with self.open() as fp:
+            return fp.read()
+
+    def text(self) -> str:
+        return self.read_bytes().decode(self.encoding, errors="replace")
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+        self._buf = None
+        self._file = None
+
+    def __len__(self):
+        return self.size
+
+    def __repr__(self):
+        where = "disk" if self.spilled else "memory"
+        return f"<Payload {self.size} bytes ({where})>"
+
+
+def as_text(raw: Any) -> Optional[str]:
+    """Texto de um raw qualquer (Payload, bytes ou str) — carregado só aqui."""
+    if raw is None:
+        return None
+    if isinstance(raw, Payload):
+        return raw.text()
+    if isinstance(raw, bytes):
+        return raw.decode("utf-8", errors="replace")
+    return raw
+
+
+def regex_value(raw: Any, pattern: str, flags: int = 0) -> Optional[str]:
+    """
+    Primeiro grupo (ou o match inteiro) de `pattern` no raw; None se não casar.
+    Num Payload com encoding compatível com ASCII e padrão ASCII, a busca roda
+    em bytes direto sobre view() (memoryview/mmap), sem montar o texto inteiro;
+    só o trecho encontrado é decodificado. Nesse modo \\d, \\w e IGNORECASE
+    valem só para ASCII.
+    """
+    if isinstance(raw, Payload) and pattern.isascii() and _ascii_compatible(raw.encoding):
+        rx = re.compile(pattern.encode("ascii"), flags)
+        with raw.view() as buf:
+            m = rx.search(buf)
+            found = (m.group(1) if m.groups() else m.group(0)) if m else None
+            del m  # o match segura o buffer: solta antes de fechar a view/mmap
+        return None if found is None else found.decode(raw.encoding, errors="replace")
+    m = re.search(pattern, as_text(raw) or "", flags=flags)
+    return m.group(1) if m and m.groups() else (m.group(0) if m else None)
+
+
+def _ascii_compatible(encoding: str) -> bool:
+    try:
+        return "azAZ09<>".encode(encoding) == b"azAZ09<>"
+    except LookupError:
+        return False
+
+
+def release(raw: Any):
+    """Libera memória/arquivo temporário de um raw, se ele for um Payload."""
+    if isinstance(raw, Payload):
+        raw.close()
@@ -0,0 +1,145 @@
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+# requests opcional (só o coletor http depende dele)
+try:
+    import requests
+except ImportError:
+    requests = None
+
+
+class CollectFailed(RuntimeError):
+    """Falha definitiva de coleta (após retries ou com o circuito aberto); carrega o meta da tentativa."""
+
+    def __init__(self, message: str, meta: Dict[str, Any]):
+        super().__init__(message)
+        self.meta = meta
+
+
+class CollectUnavailable(RuntimeError):
+    """Coleta que 'deu certo' mas sem o conteúdo (ex.: embed que não carregou): transitória."""
+
+    def __init__(self, message: str, meta: Dict[str, Any]):
+        super().__init__(message)
+        self.meta = meta
+
+
+def unavailable_reason(resp) -> Optional[str]:
+    """Motivo para tratar uma resposta como falha transitória; None se ela é utilizável."""
+    meta = getattr(resp, "meta", None) or {}
+    if meta.get("frame") == "not_found":
+        # o coletor do Power BI engole timeouts de navegação e só não acha o iframe
+        return "iframe do Power BI não encontrado (relatório não carregou)"
+    return None
+
+
+@dataclass
+class RetryPolicy:
+    retries: int = 2             # tentativas extras para erros transitórios
+    backoff_s: float = 2.0       # base do backoff exponencial
+    backoff_max_s: float = 30.0
+    jitter: bool = True          # "full jitter": sorteia entre 0 e o backoff
+
+    def delay(self, attempt: int) -> float:
+        d = min(self.backoff_max_s, self.backoff_s * (2 ** (attempt - 1)))
+        return random.uniform(0, d) if self.jitter else d
+
+
+def is_transient(exc: BaseException) -> bool:
+    """Timeouts, falhas de conexão e HTTP 429/5xx valem retry; o resto (config, credenciais...) não."""
+    if isinstance(exc, CollectFailed):
+        return False
+    if isinstance(exc, CollectUnavailable):
+        return True
+    if requests is not None and isinstance(exc, requests.RequestException):
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+        if status is not None:
+            return status == 429 or status >= 500
+        # URL inválida, schema ausente etc. não melhoram com retry
+        return isinstance(exc, (requests.ConnectionError, requests.Timeout,
+                                requests.exceptions.ChunkedEncodingError))
+    # playwright.sync_api.TimeoutError não herda de TimeoutError
+    if isinstance(exc, (TimeoutError, ConnectionError)) or type(exc).__name__ == "TimeoutError":
+        return True
+    # erros de rede do Chromium (playwright.Error: net::ERR_CONNECTION_REFUSED etc.)
+    return "net::err_" in str(exc).lower()
+
+
+def host_key(collector: str, source: str) -> str:
+    netloc = urlsplit(source or "").netloc.lower()
+    return netloc or f"{collector}:{source}"
+
+
+class CircuitBreaker:
+    """
+    Circuito por host: após `threshold` falhas transitórias seguidas ele abre e
+    as tasks seguintes daquele host falham na hora. Depois de `cooldown_s`
+    libera uma tentativa (half_open); sucesso fecha, falha reabre.
+    """
+
+    def __init__(self, threshold: int = 3, cooldown_s: float = 300.0, clock=time.monotonic):
+        self.threshold = threshold
+        self.cooldown_s = cooldown_s
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._hosts: Dict[str, Dict[str, Any]] = {}
+
+    def _entry(self, host: str) -> Dict[str, Any]:
+        return self._hosts.setdefault(host, {"state": "closed", "failures": 0, "opened_at": None, "trial": False})
+
+    def state(self, host: str) -> str:
+        with self._lock:
+            e = self._entry(host)
+            if e["state"] == "open" and self.clock() - e["opened_at"] >= self.cooldown_s:
+                e["state"] = "half_open"
+            return e["state"]
+
+    def allow(self, host: str) -> bool:
+        with self._lock:
+            e = self._entry(host)
+            if e["state"] == "open" and self.clock() - e["opened_at"] >= self.cooldown_s:
+                e["state"], e["trial"] = "half_open", False
+            if e["state"] == "closed":
+                return True
+            if e["state"] == "half_open" and not e["trial"]:
+                e["trial"] = True  # uma única tentativa de teste
+                return True
+            return False
+
+    def record_success(self, host: str):
+        with self._lock:
+            self._hosts[host] = {"state": "closed", "failures": 0, "opened_at": None, "trial": False}
+
+    def record_failure(self, host: str):
+        with self._lock:
+            e = self._entry(host)
+            e["failures"] += 1
+            if e["state"] == "half_open" or e["failures"] >= self.threshold:
+                e["state"], e["opened_at"], e["trial"] = "open", self.clock(), False
+
+    def snapshot(self, host: str) -> Dict[str, Any]:
+        state = self.state(host)
+        with self._lock:
+            return {"host": host, "state": state, "failures": self._hosts[host]["failures"]}
+
+
+def policy_from_cfg(cfg: Optional[Dict[str, Any]]) -> RetryPolicy:
+    cfg = cfg or {}
+    return RetryPolicy(
+        retries=int(cfg.get("retries", 2)),
+        backoff_s=float(cfg.get("backoff_s", 2.0)),
+        backoff_max_s=float(cfg.get("backoff_max_s", 30.0)),
+        jitter=bool(cfg.get("jitter", True)),
+    )
+
+
+def breaker_from_cfg(cfg: Optional[Dict[str, Any]]) -> CircuitBreaker:
+    cfg = cfg or {}
+    return CircuitBreaker(
+        threshold=int(cfg.get("breaker_threshold", 3)),
+        cooldown_s=float(cfg.get("breaker_cooldown_s", 300.0)),
+    )
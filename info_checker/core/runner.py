@@ -1,32 +1,65 @@
 # info_checker/core/runner.py
 import json
-from typing import Any, Dict
+import time
+from dataclasses import replace
+from pathlib import Path
+from typing import Any, Dict, List, Union
 
 from .models import Task
 from .interfaces import Collector
+from .payload import regex_value, release
+from .coalescing import coalescer_from_cfg, fingerprint
+from .resilience import (CollectFailed, CollectUnavailable, breaker_from_cfg, host_key, is_transient,
+                         policy_from_cfg, unavailable_reason)
+from ..utils.log import get_logger
+from ..utils.exports import task_dir_for
 from ..collectors.http_requests import HttpCollector, simple_bs_extract  # se você tiver esse coletor
-from ..collectors.playwright_browser import PlaywrightCollector
+from ..collectors.playwright_browser import PlaywrightCollector, DEFAULT_LOGIN_CACHE
+from ..collectors.desktop_pyautogui import DesktopCollector
+
+log = get_logger(__name__)
+
+# coletores cujas requests idênticas são coalescidas por padrão (os demais: extra.coalesce: true)
+COALESCED_COLLECTORS = ("http",)
 
 
 class Runner:
-    def __init__(self, cfg_collectors: Dict[str, Any] | None = None):
+    def __init__(self, cfg_collectors: Dict[str, Any] | None = None, run_dir: str | Path | None = None,
+                 resilience: Dict[str, Any] | None = None, coalescing: Dict[str, Any] | None = None):
         cfg_collectors = cfg_collectors or {}
+        # requests idênticas no mesmo run compartilham uma coleta (e o documento parseado)
+        self.coalescer = coalescer_from_cfg(coalescing)
+        # retries com backoff + circuit breaker por host em volta de cada coleta
+        self.retry_policy = policy_from_cfg(resilience)
+        self.breaker = breaker_from_cfg(resilience)
+        self._sleep = time.sleep
+        # se definido, cada task exporta em <run_dir>/<task_id> (isolada das demais)
+        self.run_dir = Path(run_dir) if run_dir else None
         # instância dos coletores disponíveis
         self.collectors: Dict[str, Collector] = {
             "http": HttpCollector(timeout=cfg_collectors.get("http", {}).get("timeout", 25)),
             "playwright": PlaywrightCollector(
                 headless=cfg_collectors.get("playwright", {}).get("headless", True),
                 default_timeout_ms=cfg_collectors.get("playwright", {}).get("timeout_ms", 20000),
+                login_cache=cfg_collectors.get("playwright", {}).get("login_cache", DEFAULT_LOGIN_CACHE),
             ),
+            "desktop": DesktopCollector(delay_ms=cfg_collectors.get("desktop", {}).get("delay_ms", 500)),
         }
+        # último valor extraído por captura (capture_key + extração), com o raw de origem;
+        # reaproveitado quando a captura não mudou, mesmo que venha de outra task
+        self._last_values: Dict[tuple, tuple] = {}
 
-    def run_task(self, task: Task) -> Dict[str, Any]:
-        if task.collector not in self.collectors:
-            raise KeyError(f"Collector '{task.collector}' não registrado.")
-
-        collector = self.collectors[task.collector]
-        col_resp = collector.collect(task.request)
+    def _request_for(self, task: Task):
+        extra = dict(task.request.extra or {})
+        if self.run_dir is not None:
+            extra.setdefault("export_dir", str(task_dir_for(self.run_dir, task.id)))
+        # sem extração, o coletor pode pular a captura do conteúdo bruto (ex.: page.content())
+        strategy = (task.extraction or {}).get("strategy", "none")
+        extra.setdefault("need_content", strategy not in (None, "", "none"))
+        return replace(task.request, extra=extra)
 
+    def _extract_value(self, task: Task, col_resp, doc=None) -> Any:
+        # doc: resultado compartilhado (SharedResult), com o HTML já parseado
         strategy = (task.extraction or {}).get("strategy", "none")
         value = None
 
@@ -39,16 +72,190 @@ class Runner:
             path = task.extraction.get("path")
             if not path:
                 raise ValueError("extraction.strategy=css exige 'path'")
-            value = simple_bs_extract(col_resp.raw, path)
+            value = simple_bs_extract(col_resp.raw, task.extraction, soup=doc.soup() if doc else None)
         elif strategy == "regex":
             import re
             pattern = task.extraction.get("pattern")
             if not pattern:
                 raise ValueError("extraction.strategy=regex exige 'pattern'")
-            m = re.search(pattern, col_resp.raw or "", flags=re.DOTALL | re.IGNORECASE)
-            value = m.group(1) if m and m.groups() else (m.group(0) if m else None)
+            # busca direto no buffer (memória/mmap), sem decodificar o conteúdo inteiro
+            value = regex_value(col_resp.raw, pattern, flags=re.DOTALL | re.IGNORECASE)
         else:
             raise ValueError(f"Extraction strategy not supported: {strategy}")
+        return value
+
+    def _collector_for(self, task: Task) -> Collector:
+        if task.collector not in self.collectors:
+            raise KeyError(f"Collector '{task.collector}' não registrado.")
+        return self.collectors[task.collector]
+
+    def _collect_resilient(self, name: str, collector: Collector, reqs: List[Any]) -> List[Any]:
+        """
+        Coleta com retries (backoff exponencial com jitter) para erros transitórios e
+        circuit breaker por host. Só os requests que falharam são tentados de novo;
+        resposta sem conteúdo (ex.: iframe do Power BI não encontrado) conta como falha.
+        Devolve resposta ou CollectFailed por request; o meta de cada um ganha
+        'resilience' (tentativas + estado do circuito).
+        """
+        host = host_key(name, reqs[0].source)
+        results: List[Any] = [None] * len(reqs)
+        attempts = [0] * len(reqs)
+        pending = list(range(len(reqs)))
+        attempt = 0
+        while pending:
+            if not self.breaker.allow(host):
+                for i in pending:
+                    # quem já tentou mantém o próprio erro; os demais falham sem tentar
+                    if results[i] is None:
+                        results[i] = CollectFailed(f"Circuito aberto para '{host}': coleta não tentada.", {})
+                break
+            attempt += 1
+            for i in pending:
+                attempts[i] += 1
+            try:
+                if len(pending) == 1:
+                    out = [collector.collect(reqs[pending[0]])]
+                else:
+                    out = collector.collect_many([reqs[i] for i in pending])
+            except Exception as e:
+                out = [e] * len(pending)
+
+            retry, transient = [], False
+            for i, r in zip(pending, out):
+                reason = None if isinstance(r, Exception) else unavailable_reason(r)
+                if reason:
+                    release(r.raw)
+                    r = CollectUnavailable(reason, r.meta or {})
+                results[i] = r
+                if isinstance(r, Exception) and is_transient(r):
+                    transient = True
+                    if attempt <= self.retry_policy.retries:
+                        retry.append(i)
+            # erro não transitório (ex.: 404, config) também mostra que o host respondeu
+            if transient:
+                self.breaker.record_failure(host)
+            else:
+                self.breaker.record_success(host)
+
+            pending = retry
+            if pending and self.breaker.state(host) == "closed":
+                delay = self.retry_policy.delay(attempt)
+                log.warning(f"Falha transitória em '{host}' (tentativa {attempt}); nova tentativa em {delay:.1f}s: "
+                            f"{results[pending[0]]}")
+                self._sleep(delay)
+
+        snapshot = self.breaker.snapshot(host)
+        for i, r in enumerate(results):
+            info = {"attempts": attempts[i], "breaker": snapshot}
+            if isinstance(r, Exception):
+                meta = {**getattr(r, "meta", {}), "resilience": info}
+                failed = CollectFailed(str(r), meta)
+                failed.__cause__ = r
+                results[i] = failed
+            else:
+                r.meta = {**(r.meta or {}), "resilience": info}
+        return results
+
+    def _coalesces(self, task: Task) -> bool:
+        if self.coalescer is None:
+            return False
+        flag = (task.request.extra or {}).get("coalesce")
+        return task.collector in COALESCED_COLLECTORS if flag is None else bool(flag)
+
+    def plan(self, tasks: List[Task]):
+        """
+        Registra as tasks que vão rodar isoladas (run_task) neste run: só os
+        fingerprints que aparecem mais de uma vez são coalescidos, e o resultado
+        compartilhado é liberado assim que a última task que o espera termina.
+        """
+        if self.coalescer is None:
+            return
+        counts: Dict[str, int] = {}
+        for task in tasks:
+            if self._coalesces(task):
+                key = fingerprint(task.collector, self._request_for(task))
+                counts[key] = counts.get(key, 0) + 1
+        self.coalescer.expect({k: n for k, n in counts.items() if n > 1})
+
+    def _collect_one(self, task: Task, collector: Collector, req) -> Any:
+        col_resp = self._collect_resilient(task.collector, collector, [req])[0]
+        if isinstance(col_resp, Exception):
+            raise col_resp
+        return col_resp
+
+    def run_task(self, task: Task) -> Dict[str, Any]:
+        collector = self._collector_for(task)
+        req = self._request_for(task)
+        key = fingerprint(task.collector, req) if self._coalesces(task) else None
+        # só coalesce o que outra task do run (plan) também vai pedir
+        if key is None or not self.coalescer.wants(key):
+            return self._finish(task, self._collect_one(task, collector, req))
+
+        # outra task do run pode precisar do conteúdo, mesmo que esta não extraia nada
+        req.extra["need_content"] = True
+        shared, reused = self.coalescer.get_or_collect(key, task.id, lambda: self._collect_one(task, collector, req))
+        try:
+            if reused:
+                log.debug(f"Task '{task.id}' reaproveitou a coleta de '{shared.owner_task}' ({key[:12]})")
+            # meta próprio por task; o raw é do cache (liberado quando a última task esperada termina)
+            col_resp = replace(shared.response, meta={
+                **(shared.response.meta or {}),
+                "coalesced": {"fingerprint": key[:12], "shared": reused, "source_task": shared.owner_task},
+            })
+            return self._finish(task, col_resp, doc=shared)
+        finally:
+            self.coalescer.release(shared)
+
+    def run_group(self, tasks: List[Task]) -> List[Union[Dict[str, Any], Exception]]:
+        """
+        Executa tasks de um mesmo grupo (mesmo coletor) numa única sessão do coletor
+        (ex.: um login/navegador para todas as variantes do Power BI).
+        Devolve, na ordem das tasks, o resultado ou a exceção de cada uma.
+        """
+        try:
+            collector = self._collector_for(tasks[0])
+            if any(t.collector != tasks[0].collector for t in tasks):
+                raise ValueError("Tasks de um grupo devem usar o mesmo coletor.")
+            responses = self._collect_resilient(tasks[0].collector, collector, [self._request_for(t) for t in tasks])
+        except Exception as e:
+            return [e] * len(tasks)
+
+        results: List[Union[Dict[str, Any], Exception]] = []
+        for task, col_resp in zip(tasks, responses):
+            if isinstance(col_resp, Exception):
+                results.append(col_resp)
+                continue
+            try:
+                results.append(self._finish(task, col_resp))
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def close(self):
+        if self.coalescer is not None:
+            self.coalescer.clear()
+
+    def _finish(self, task: Task, col_resp, doc=None) -> Dict[str, Any]:
+        strategy = (task.extraction or {}).get("strategy", "none")
+        meta = col_resp.meta or {}
+        cache_key = None
+        if meta.get("capture_key"):
+            cache_key = (task.collector, meta["capture_key"], json.dumps(task.extraction or {}, sort_keys=True))
+        cached = self._last_values.get(cache_key) if cache_key else None
+        # captura idêntica à anterior (ex.: DesktopCollector devolve o mesmo PNG):
+        # reaproveita o valor extraído daquele raw, sem extrair de novo
+        if meta.get("unchanged") and cached is not None and cached[0] is col_resp.raw:
+            value = cached[1]
+        else:
+            try:
+                value = self._extract_value(task, col_resp, doc=doc)
+            finally:
+                # o resultado não carrega o raw: libera memória/arquivo temporário já aqui
+                # (o de uma coleta compartilhada fica no cache do coalescer)
+                if doc is None:
+                    release(col_resp.raw)
+            if cache_key:
+                self._last_values[cache_key] = (col_resp.raw, value)
 
         # ---- Validações ----
         validations = []
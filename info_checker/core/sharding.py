@@ -0,0 +1,25 @@
+import hashlib
+from typing import List
+
+from .models import Task
+
+
+def shard_of(task_id: str, shard_count: int) -> int:
+    """
+    Shard (0..shard_count-1) de uma task, por hash estável do id.
+    Usa sha1 (e não hash()) para que todas as máquinas cheguem ao mesmo resultado.
+    """
+    if shard_count < 1:
+        raise ValueError("shard_count deve ser >= 1")
+    digest = hashlib.sha1(task_id.encode("utf-8")).hexdigest()
+    return int(digest[:12], 16) % shard_count
+
+
+def select_shard(tasks: List[Task], shard_index: int, shard_count: int) -> List[Task]:
+    """Filtra as tasks que pertencem ao shard informado (ordem original preservada)."""
+    if shard_count < 1:
+        raise ValueError("shard_count deve ser >= 1")
+    if not 0 <= shard_index < shard_count:
+        raise ValueError(f"shard_index deve estar entre 0 e {shard_count - 1}")
+    # tasks de um mesmo grupo ficam juntas no mesmo shard (compartilham sessão)
+    return [t for t in tasks if shard_of(t.group or t.id, shard_count) == shard_index]
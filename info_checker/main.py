@@ -1,12 +1,74 @@
 import argparse
-import json
+import copy
+import itertools
 import os
-import sys
-from typing import List
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
 
 import yaml
 from info_checker.core.models import Task, CollectRequest, ValidationRule
 from info_checker.core.runner import Runner
+from info_checker.core.sharding import select_shard
+from info_checker.utils.exports import merge_run_to_xlsx, run_dir_for
+from info_checker.utils.log import get_logger, setup_logging
+from info_checker.utils.output import FORMATS, ResultWriter
+
+log = get_logger("main")
+
+
+_REQUEST_FIELDS = ("source", "selector", "method")
+
+
+def _fill_params(obj: Any, params: Dict[str, Any]) -> Any:
+    # troca "{nome}" pelos valores da matrix em todas as strings (sem str.format,
+    # para não quebrar regex com chaves, ex.: \d{2})
+    if isinstance(obj, str):
+        for k, v in params.items():
+            obj = obj.replace("{" + k + "}", str(v))
+        return obj
+    if isinstance(obj, list):
+        return [_fill_params(v, params) for v in obj]
+    if isinstance(obj, dict):
+        return {k: _fill_params(v, params) for k, v in obj.items()}
+    return obj
+
+
+def _expand_matrix(t: dict) -> List[dict]:
+    """
+    Expande um template com 'matrix' (nome -> lista de valores) no produto cartesiano.
+    Para cada combinação:
+      - "{nome}" é substituído em id/request/extraction/rules
+      - source/selector/method recebem o valor direto; os demais nomes vão para
+        request.extra (ex.: tabs_to_extract: [[A], [B, C]])
+      - se o id não distinguir as variantes, elas viram '<id>__1', '<id>__2', ...
+    """
+    matrix = t.get("matrix")
+    if not matrix:
+        return [t]
+    if not isinstance(matrix, dict) or not all(isinstance(v, list) and v for v in matrix.values()):
+        raise TypeError(f"Tarefa '{t['id']}': 'matrix' deve mapear nomes para listas não vazias.")
+
+    names = list(matrix)
+    variants = []
+    for n, combo in enumerate(itertools.product(*(matrix[k] for k in names)), start=1):
+        params = dict(zip(names, combo))
+        v = _fill_params({k: copy.deepcopy(val) for k, val in t.items() if k != "matrix"}, params)
+        request = v["request"] = dict(v["request"])
+        extra = request["extra"] = dict(request.get("extra") or {})
+        for k, val in params.items():
+            if k in _REQUEST_FIELDS:
+                request[k] = val
+            else:
+                extra[k] = val
+        v["group"] = t["id"]
+        variants.append(v)
+
+    # id sem placeholders suficientes para distinguir as variantes: numera
+    if len({v["id"] for v in variants}) < len(variants):
+        for n, v in enumerate(variants, start=1):
+            v["id"] = f"{v['id']}__{n}"
+    return variants
 
 
 def load_tasks(cfg: dict) -> List[Task]:
@@ -15,6 +77,8 @@ def load_tasks(cfg: dict) -> List[Task]:
     Agora 'extraction' e 'rules' são OPCIONAIS:
       - Se não existirem, usamos extraction={"strategy":"none","pattern":""} e rules=[]
       - Isso permite tarefas cujo foco é exportação/automação via Playwright, sem regex/validação.
+    Tasks com 'matrix' são expandidas em variantes de um mesmo grupo (ver _expand_matrix),
+    executadas numa única sessão do coletor.
     """
     if cfg is None:
         raise ValueError("Arquivo YAML vazio ou inválido (yaml.safe_load retornou None).")
@@ -27,49 +91,57 @@ def load_tasks(cfg: dict) -> List[Task]:
 
     tasks: List[Task] = []
 
-    for idx, t in enumerate(cfg["tasks"], start=1):
-        if not isinstance(t, dict):
+    for idx, template in enumerate(cfg["tasks"], start=1):
+        if not isinstance(template, dict):
             raise TypeError(f"Tarefa #{idx} não é um objeto YAML (dict).")
 
         # Agora só exigimos chaves essenciais:
         for req_key in ("id", "collector", "request"):
-            if req_key not in t:
-                raise KeyError(f"Tarefa '{t.get('id', f'#{idx}')}' sem a chave obrigatória: {req_key}")
+            if req_key not in template:
+                raise KeyError(f"Tarefa '{template.get('id', f'#{idx}')}' sem a chave obrigatória: {req_key}")
+
+        tasks.extend(_build_task(t) for t in _expand_matrix(template))
 
-        # Construção do CollectRequest
-        req = CollectRequest(**t["request"])
+    ids = [t.id for t in tasks]
+    dup = sorted({i for i in ids if ids.count(i) > 1})
+    if dup:
+        raise ValueError(f"Ids de tarefa duplicados: {', '.join(dup)}")
 
-        # extraction/rules tornam-se opcionais
-        extraction = t.get("extraction")
-        rules_raw = t.get("rules")
+    return tasks
 
-        # Defaults amigáveis quando não vier nada
-        if extraction is None:
-            extraction = {"strategy": "none", "pattern": ""}
 
-        rules: List[ValidationRule] = []
-        if isinstance(rules_raw, list):
-            rules = [ValidationRule(**r) for r in rules_raw]
-        elif rules_raw is None:
-            rules = []
-        else:
-            raise TypeError(f"Tarefa '{t['id']}': 'rules' deve ser lista quando presente.")
-
-        # Log leve para ajudar o usuário a entender que validação foi pulada
-        if extraction.get("strategy") == "none" and not rules:
-            print(f"[INFO] Tarefa '{t['id']}' sem 'extraction/rules' — validação será pulada.", file=sys.stderr)
-
-        tasks.append(
-            Task(
-                id=t["id"],
-                collector=t["collector"],
-                request=req,
-                extraction=extraction,
-                rules=rules,
-            )
-        )
+def _build_task(t: dict) -> Task:
+    # Construção do CollectRequest
+    req = CollectRequest(**t["request"])
 
-    return tasks
+    # extraction/rules tornam-se opcionais
+    extraction = t.get("extraction")
+    rules_raw = t.get("rules")
+
+    # Defaults amigáveis quando não vier nada
+    if extraction is None:
+        extraction = {"strategy": "none", "pattern": ""}
+
+    rules: List[ValidationRule] = []
+    if isinstance(rules_raw, list):
+        rules = [ValidationRule(**r) for r in rules_raw]
+    elif rules_raw is None:
+        rules = []
+    else:
+        raise TypeError(f"Tarefa '{t['id']}': 'rules' deve ser lista quando presente.")
+
+    # Log leve para ajudar o usuário a entender que validação foi pulada
+    if extraction.get("strategy") == "none" and not rules:
+        log.info(f"Tarefa '{t['id']}' sem 'extraction/rules' — validação será pulada.")
+
+    return Task(
+        id=t["id"],
+        collector=t["collector"],
+        request=req,
+        extraction=extraction,
+        rules=rules,
+        group=t.get("group"),
+    )
 
 
 def parse_args():
@@ -81,50 +153,152 @@ def parse_args():
         default=default_cfg,
         help=f"Caminho para o arquivo config.yaml (default: {default_cfg})",
     )
+    ap.add_argument(
+        "--output-dir",
+        default="exports",
+        help="Raiz das exportações; cada execução grava em <output-dir>/runs/<run-id>/<task_id> (default: exports)",
+    )
+    ap.add_argument(
+        "--run-id",
+        default=None,
+        help="Id da execução. Use o mesmo id em todas as máquinas de um run distribuído (default: timestamp)",
+    )
+    ap.add_argument("--shard-index", type=int, default=0, help="Índice deste shard (0..shard-count-1)")
+    ap.add_argument("--shard-count", type=int, default=1, help="Total de shards/máquinas (default: 1)")
+    ap.add_argument(
+        "--merge-run",
+        metavar="RUN_ID",
+        default=None,
+        help="Não executa tasks: junta os CSVs de todos os shards do run em um único Excel",
+    )
+    ap.add_argument("--merge-out", default=None, help="Caminho do Excel gerado por --merge-run")
+    ap.add_argument(
+        "--output",
+        choices=FORMATS,
+        default="pretty",
+        help="Formato dos resultados: ndjson (1 linha por task), json (array ao final) ou pretty (default)",
+    )
+    ap.add_argument("--output-file", default=None, help="Grava os resultados neste arquivo em vez do stdout")
+    ap.add_argument("--workers", type=int, default=1, help="Tasks executadas em paralelo (default: 1)")
+    ap.add_argument(
+        "--order",
+        choices=("completion", "input"),
+        default="completion",
+        help="Com --workers > 1: emitir na ordem de término (default) ou na ordem das tasks",
+    )
+    ap.add_argument("--log-format", choices=("text", "json"), default="text", help="Formato dos diagnósticos (stderr)")
+    ap.add_argument("--log-file", default=None, help="Grava os diagnósticos neste arquivo em vez do stderr")
+    ap.add_argument("--log-level", default="DEBUG", help="Nível mínimo dos diagnósticos (default: DEBUG)")
     return ap.parse_args()
 
 
+def _error_result(task: Task, e: Exception) -> Dict[str, Any]:
+    log.error(f"Falha ao executar a task '{task.id}': {e}", extra={"fields": {"task_id": task.id}})
+    # mantém exatamente um resultado por task, mesmo em caso de erro
+    result = {"task_id": task.id, "ok": False, "error": str(e)}
+    if getattr(e, "meta", None):
+        result["meta"] = e.meta  # ex.: tentativas e estado do circuit breaker
+    return result
+
+
+def _group_units(tasks: List[Task]) -> List[List[Tuple[int, Task]]]:
+    """Agrupa (índice, task) por grupo; tasks sem grupo formam unidades sozinhas."""
+    units: Dict[Any, List[Tuple[int, Task]]] = {}
+    for i, task in enumerate(tasks):
+        units.setdefault(task.group or ("task", i), []).append((i, task))
+    return list(units.values())
+
+
+def _run_unit(runner: Runner, unit: List[Tuple[int, Task]]) -> List[Tuple[int, Dict[str, Any]]]:
+    if len(unit) == 1:
+        i, task = unit[0]
+        try:
+            return [(i, runner.run_task(task))]
+        except Exception as e:
+            return [(i, _error_result(task, e))]
+    results = runner.run_group([task for _, task in unit])
+    return [
+        (i, _error_result(task, r) if isinstance(r, Exception) else r)
+        for (i, task), r in zip(unit, results)
+    ]
+
+
 def main():
     args = parse_args()
+    setup_logging(fmt=args.log_format, level=args.log_level, path=args.log_file)
+
+    if args.merge_run:
+        try:
+            merge_run_to_xlsx(run_dir_for(args.output_dir, args.merge_run), args.merge_out)
+        except Exception as e:
+            log.error(f"Falha ao juntar o run '{args.merge_run}': {e}")
+            return 1
+        return 0
+
     cfg_path = os.path.abspath(args.config)
 
     if not os.path.exists(cfg_path):
-        print(f"[ERRO] config.yaml não encontrado em: {cfg_path}", file=sys.stderr)
+        log.error(f"config.yaml não encontrado em: {cfg_path}")
         return 2
 
-    print(f"[INFO] Usando config: {cfg_path}")
+    log.info(f"Usando config: {cfg_path}")
 
     try:
         with open(cfg_path, "r", encoding="utf-8") as f:
             cfg = yaml.safe_load(f)
     except yaml.YAMLError as e:
-        print("[ERRO] Falha ao parsear YAML do config:", e, file=sys.stderr)
+        log.error(f"Falha ao parsear YAML do config: {e}")
         return 2
 
     # debug opcional
     try:
-        print("[DEBUG] Config keys:", list(cfg.keys()) if isinstance(cfg, dict) else type(cfg).__name__)
+        log.debug(f"Config keys: {list(cfg.keys()) if isinstance(cfg, dict) else type(cfg).__name__}")
     except Exception:
         pass
 
+    run_id = args.run_id or datetime.now().strftime("%Y%m%d-%H%M%S")
+    run_dir = run_dir_for(args.output_dir, run_id)
+
     try:
-        runner = Runner(cfg_collectors=cfg.get("collectors", {}) if isinstance(cfg, dict) else {})
+        runner = Runner(
+            cfg_collectors=cfg.get("collectors", {}) if isinstance(cfg, dict) else {},
+            run_dir=run_dir,
+            resilience=cfg.get("resilience") if isinstance(cfg, dict) else None,
+            coalescing=cfg.get("coalescing") if isinstance(cfg, dict) else None,
+        )
         tasks = load_tasks(cfg)
+        total = len(tasks)
+        tasks = select_shard(tasks, args.shard_index, args.shard_count)
     except Exception as e:
-        print(f"[ERRO] Config inválido: {e}", file=sys.stderr)
+        log.error(f"Config inválido: {e}")
         return 2
 
-    # executa cada task
+    log.info(f"Run '{run_id}' em {run_dir} — shard {args.shard_index}/{args.shard_count}: "
+             f"{len(tasks)} de {total} tasks")
+
+    # executa as tasks (grupos de matrix numa sessão só); cada resultado é
+    # emitido assim que a task (ou o grupo) termina
     exit_code = 0
-    for task in tasks:
+    units = _group_units(tasks)
+    # coalescing só entre tasks isoladas (grupos já dividem a sessão do coletor)
+    runner.plan([unit[0][1] for unit in units if len(unit) == 1])
+    with ResultWriter(args.output, path=args.output_file, ordered=args.order == "input") as writer:
+        if args.workers <= 1:
+            done = (_run_unit(runner, unit) for unit in units)
+        else:
+            pool = ThreadPoolExecutor(max_workers=args.workers)
+            futures = [pool.submit(_run_unit, runner, unit) for unit in units]
+            done = (fut.result() for fut in as_completed(futures))
         try:
-            result = runner.run_task(task)
-            print(json.dumps(result, ensure_ascii=False, indent=2))
-            if not result.get("ok"):
-                exit_code = 1
-        except Exception as e:
-            print(f"[ERRO] Falha ao executar a task '{task.id}': {e}", file=sys.stderr)
-            exit_code = 1
+            for unit_results in done:
+                for i, result in unit_results:
+                    writer.submit(i, result)
+                    if not result.get("ok"):
+                        exit_code = 1
+        finally:
+            if args.workers > 1:
+                pool.shutdown()
+            runner.close()
 
     return exit_code
 
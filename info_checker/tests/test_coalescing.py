@@ -0,0 +1,93 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from info_checker.core.coalescing import RequestCoalescer
+from info_checker.core.models import CollectRequest, CollectResponse, Task
+from info_checker.core.payload import Payload
+from info_checker.core.runner import Runner
+
+HTML = "<html><p id='preco'>R$ 10,00</p><p id='data'>01/02/2024</p></html>"
+
+
+class _CountingCollector:
+    def __init__(self, gate=None):
+        self.calls = 0
+        self.gate = gate
+
+    def collect(self, req):
+        self.calls += 1
+        if self.gate:
+            self.gate.wait(5)
+        return CollectResponse(raw=Payload.of(HTML), extracted=None, meta={"status": 200})
+
+
+def _task(tid, url, extraction):
+    return Task(id=tid, collector="http", request=CollectRequest(source=url), extraction=extraction, rules=[])
+
+
+def test_identical_requests_share_one_collection():
+    runner = Runner()
+    col = runner.collectors["http"] = _CountingCollector()
+    tasks = [_task("a", "https://x/p", {"strategy": "css", "path": "#preco"}),
+             _task("b", "https://x/p", {"strategy": "regex", "pattern": r"(\d{2}/\d{2}/\d{4})"}),
+             _task("c", "https://x/outra", {"strategy": "css", "path": "#data"})]
+    runner.plan(tasks)
+    a, b, c = (runner.run_task(t) for t in tasks)
+
+    assert col.calls == 2
+    assert (a["value"], b["value"], c["value"]) == ("R$ 10,00", "01/02/2024", "01/02/2024")
+    assert a["meta"]["coalesced"]["shared"] is False
+    assert b["meta"]["coalesced"] == {**a["meta"]["coalesced"], "shared": True, "source_task": "a"}
+    # URL pedida uma vez só no run: coleta normal, nada fica em cache
+    assert "coalesced" not in c["meta"]
+    assert runner.coalescer._entries == {}
+
+
+def test_concurrent_requests_wait_for_in_flight_collection():
+    gate = threading.Event()
+    runner = Runner()
+    col = runner.collectors["http"] = _CountingCollector(gate)
+    tasks = [_task(f"t{i}", "https://x/p", {"strategy": "css", "path": "#preco"}) for i in range(4)]
+    runner.plan(tasks)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(runner.run_task, t) for t in tasks]
+        gate.set()
+        results = [f.result() for f in futures]
+
+    assert col.calls == 1
+    assert {r["value"] for r in results} == {"R$ 10,00"}
+    assert sum(r["meta"]["coalesced"]["shared"] for r in results) == 3
+    assert runner.coalescer._entries == {}   # liberado após a última task esperada
+
+
+def test_ttl_expiry_and_disabled():
+    now = [0.0]
+    co = RequestCoalescer(ttl_s=10, clock=lambda: now[0])
+    calls = []
+    collect = lambda: calls.append(1) or CollectResponse(raw="x", extracted=None, meta={})
+    assert co.get_or_collect("k", "a", collect)[1] is False
+    assert co.get_or_collect("k", "b", collect)[1] is True
+    now[0] = 11
+    assert co.get_or_collect("k", "c", collect)[1] is False
+    assert len(calls) == 2
+
+    runner = Runner(coalescing={"enabled": False})
+    col = runner.collectors["http"] = _CountingCollector()
+    tasks = [_task(tid, "https://x/p", {"strategy": "css", "path": "#preco"}) for tid in ("a", "b")]
+    runner.plan(tasks)
+    for task in tasks:
+        assert "coalesced" not in runner.run_task(task)["meta"]
+    assert col.calls == 2
+
+
+def test_evicted_entry_stays_open_while_read():
+    co = RequestCoalescer(max_entries=1)
+    collect = lambda: CollectResponse(raw=Payload.of(HTML), extracted=None, meta={})
+    a, _ = co.get_or_collect("a", "t1", collect)
+    b, _ = co.get_or_collect("b", "t2", collect)   # tira 'a' do cache enquanto t1 ainda lê
+
+    assert a.evicted and a.soup().select_one("#preco").get_text() == "R$ 10,00"
+    co.release(a)
+    assert a.response.raw._buf is None   # fechado só depois do último leitor
+    co.release(b)
+    assert not b.evicted
@@ -0,0 +1,56 @@
+import pytest
+
+from info_checker.collectors.desktop_pyautogui import DesktopCollector, ReplayScreenshotProvider, parse_region
+from info_checker.core.models import CollectRequest
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def _png(path, color, box=None):
+    img = Image.new("RGB", (40, 30), "white")
+    if box:
+        img.paste(color, box)
+    img.save(path)
+    return str(path)
+
+def test_unchanged_region_is_detected(tmp_path):
+    a = _png(tmp_path / "a.png", "black")
+    b = _png(tmp_path / "b.png", "black", (30, 20, 35, 25))   # muda fora da região
+    c = _png(tmp_path / "c.png", "black", (2, 2, 6, 6))       # muda dentro da região
+    col = DesktopCollector(ReplayScreenshotProvider([a, b, c]), delay_ms=0)
+    req = CollectRequest(source="app", selector="0,0,10,10")
+
+    first, second, third = (col.collect(req) for _ in range(3))
+
+    assert first.meta["unchanged"] is False
+    assert second.meta["unchanged"] is True and second.raw is first.raw
+    assert third.meta["unchanged"] is False
+    assert third.raw.startswith(b"\x89PNG")
+    assert first.meta["region"] == [0, 0, 10, 10]
+
+def test_parse_region():
+    assert parse_region(None, {"left": 1, "top": 2, "width": 3, "height": 4}) == (1, 2, 3, 4)
+    assert parse_region(None) is None
+    with pytest.raises(ValueError):
+        parse_region("1,2,0,4")
+
+def test_runner_skips_extraction_when_capture_unchanged(tmp_path, monkeypatch):
+    from info_checker.core.models import Task
+    from info_checker.core.runner import Runner
+
+    a = _png(tmp_path / "a.png", "black")
+    c = _png(tmp_path / "c.png", "black", (2, 2, 6, 6))
+    runner = Runner()
+    runner.collectors["desktop"] = DesktopCollector(ReplayScreenshotProvider([a, a, c]), delay_ms=0)
+    extracted = []
+    monkeypatch.setattr(runner, "_extract_value", lambda task, resp, doc=None: extracted.append(task.id) or "42")
+    extraction = {"strategy": "ocr"}
+    # duas tasks diferentes na mesma região: a segunda reaproveita o valor da primeira
+    tasks = [Task(id=tid, collector="desktop", request=CollectRequest(source="app", selector="0,0,10,10"),
+                  extraction=extraction, rules=[]) for tid in ("t1", "t2", "t3")]
+
+    results = [runner.run_task(t) for t in tasks]
+
+    assert [r["meta"]["unchanged"] for r in results] == [False, True, False]
+    assert extracted == ["t1", "t3"]
+    assert [r["value"] for r in results] == ["42", "42", "42"]
@@ -0,0 +1,67 @@
+from info_checker.collectors.playwright_browser import PlaywrightCollector
+
+
+class FakeLocator:
+    def __init__(self, page, selector):
+        self.page, self.selector = page, selector
+        self.first = self
+
+    def count(self):
+        self.page.probes.append(self.selector)
+        return 1 if self.selector in self.page.present else 0
+
+    def is_visible(self):
+        return True
+
+    def fill(self, value):
+        self.page.filled[self.selector] = value
+
+    def click(self, timeout=None):
+        self.page.clicked.append(self.selector)
+
+
+class FakeLoginPage:
+    def __init__(self, present):
+        self.present = set(present)
+        self.probes, self.clicked, self.filled = [], [], {}
+        self.main_frame = self
+        self.frames = [self]
+        self.url = "https://site/login"
+
+    def locator(self, selector):
+        return FakeLocator(self, selector)
+
+    def get_by_placeholder(self, text):
+        raise LookupError(text)
+
+    get_by_label = get_by_placeholder
+
+    def goto(self, url, **kw):
+        pass
+
+    def wait_for_timeout(self, ms):
+        pass
+
+    def wait_for_load_state(self, *a, **kw):
+        pass
+
+    def evaluate(self, *a):
+        return False
+
+
+def test_login_path_is_memoized_per_url(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    present = ['input[name*="user" i]', 'input[type="password"]', 'button[type="submit"]']
+    col = PlaywrightCollector(login_cache=str(tmp_path / "cache.json"))
+
+    first = FakeLoginPage(present)
+    col._perform_login(first, "https://site/login?returnUrl=a", "u", "p")
+    assert first.clicked == ['button[type="submit"]']
+
+    # nova instância relê o cache do disco e vai direto ao caminho conhecido
+    col2 = PlaywrightCollector(login_cache=str(tmp_path / "cache.json"))
+    second = FakeLoginPage(present)
+    col2._perform_login(second, "https://site/login?returnUrl=b", "u", "p")
+    assert second.filled == {'input[name*="user" i]': "u", 'input[type="password"]': "p"}
+    assert second.clicked == ['button[type="submit"]']
+    assert len(second.probes) < len(first.probes)
@@ -0,0 +1,115 @@
+from info_checker.core.interfaces import Collector
+from info_checker.core.models import CollectResponse
+from info_checker.core.runner import Runner
+from info_checker.main import _group_units, load_tasks
+
+
+CFG = {
+    "tasks": [
+        {
+            "id": "vidas_{cliente}",
+            "collector": "session",
+            "matrix": {"cliente": ["a", "b"], "tabs_to_extract": [["Performance"], ["Parâmetros"]]},
+            "request": {"source": "https://pbi/{cliente}", "extra": {"login_url": "https://login"}},
+            "extraction": {"strategy": "regex", "pattern": r"\d{2}"},
+        },
+        {"id": "solo", "collector": "session", "request": {"source": "https://x"}},
+    ]
+}
+
+
+def test_matrix_expands_into_grouped_tasks():
+    tasks = load_tasks(CFG)
+
+    assert [t.id for t in tasks] == ["vidas_a__1", "vidas_a__2", "vidas_b__3", "vidas_b__4", "solo"]
+    variants = [t for t in tasks if t.group == "vidas_{cliente}"]
+    assert len(variants) == 4
+    assert variants[0].request.source == "https://pbi/a"
+    assert variants[0].request.extra["tabs_to_extract"] == ["Performance"]
+    assert variants[0].extraction["pattern"] == r"\d{2}"
+    assert [len(u) for u in _group_units(tasks)] == [4, 1]
+
+
+class SessionCollector(Collector):
+    def __init__(self):
+        self.sessions = []
+
+    def collect(self, req):
+        return self.collect_many([req])[0]
+
+    def collect_many(self, reqs):
+        self.sessions.append(len(reqs))
+        return [CollectResponse(raw=r.source, extracted=None, meta={}) for r in reqs]
+
+
+def test_group_runs_in_one_session(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    runner = Runner()
+    runner.collectors["session"] = col = SessionCollector()
+    tasks = [t for t in load_tasks(CFG) if t.group]
+
+    results = runner.run_group(tasks)
+
+    assert col.sessions == [4]
+    assert [r["task_id"] for r in results] == [t.id for t in tasks]
+
+
+class _FakeBrowser:
+    def __init__(self):
+        self.contexts = []
+
+    def new_context(self, **kw):
+        browser = self
+
+        class Ctx:
+            def new_page(self):
+                class Page:
+                    def set_default_timeout(self, ms):
+                        pass
+                return Page()
+
+            def close(self):
+                pass
+
+        browser.contexts.append(Ctx())
+        return browser.contexts[-1]
+
+    def close(self):
+        pass
+
+
+def test_playwright_group_logs_in_once_per_account(tmp_path, monkeypatch):
+    from info_checker.collectors import playwright_browser
+    from info_checker.collectors.playwright_browser import PlaywrightCollector
+    from info_checker.core.models import CollectRequest
+
+    monkeypatch.chdir(tmp_path)
+    browser = _FakeBrowser()
+
+    class FakePlaywright:
+        def __enter__(self):
+            return type("P", (), {"chromium": type("C", (), {"launch": staticmethod(lambda **kw: browser)})()})()
+
+        def __exit__(self, *exc):
+            return False
+
+    monkeypatch.setattr(playwright_browser, "sync_playwright", FakePlaywright)
+    col = PlaywrightCollector()
+    logins, pages = [], {}
+
+    def login(page, login_url, username, password, debug_dir):
+        logins.append(username)
+        pages[id(page)] = username
+
+    monkeypatch.setattr(col, "_perform_login", login)
+    monkeypatch.setattr(col, "_collect_report", lambda page, req, reuse_page=False: CollectResponse(
+        raw=None, extracted=None, meta={"account": pages[id(page)]}))
+
+    reqs = [CollectRequest(source=f"https://pbi/{c}", extra={"login_url": "https://login", "username": u, "password": "x"})
+            for c, u in (("a1", "ana"), ("b1", "bia"), ("a2", "ana"))]
+    out = col.collect_many(reqs)
+
+    assert logins == ["ana", "bia"]
+    assert [r.meta["account"] for r in out] == ["ana", "bia", "ana"]
+    assert [r.meta["session_size"] for r in out] == [2, 1, 2]
+    assert len(browser.contexts) == 2
@@ -0,0 +1,22 @@
+import json
+
+from info_checker.utils.output import ResultWriter
+
+
+def test_ndjson_one_line_per_task_in_input_order(tmp_path):
+    path = tmp_path / "out.ndjson"
+    with ResultWriter("ndjson", path=str(path), ordered=True) as w:
+        w.submit(1, {"task_id": "b", "ok": True})
+        assert path.read_text() == ""          # aguardando a task 0
+        w.submit(0, {"task_id": "a", "ok": False, "meta": {"x": [1, 2]}})
+        w.submit(2, {"task_id": "c", "ok": True})
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert [json.loads(l)["task_id"] for l in lines] == ["a", "b", "c"]
+    assert lines[0] == '{"task_id":"a","ok":false,"meta":{"x":[1,2]}}'
+
+def test_json_array(tmp_path):
+    path = tmp_path / "out.json"
+    with ResultWriter("json", path=str(path)) as w:
+        w.submit(0, {"task_id": "a"})
+        w.submit(1, {"task_id": "b"})
+    assert [r["task_id"] for r in json.loads(path.read_text())] == ["a", "b"]
@@ -0,0 +1,60 @@
+import re
+
+import pytest
+
+from info_checker.core.models import CollectRequest, CollectResponse, Task
+from info_checker.core.payload import Payload, regex_value
+from info_checker.core.runner import Runner
+
+
+def test_small_payload_stays_in_memory():
+    p = Payload.of("<p>R$ 10,00</p>")
+    assert not p.spilled
+    assert p.text() == "<p>R$ 10,00</p>"
+
+def test_large_payload_spills_to_disk():
+    p = Payload(max_memory=16)
+    for _ in range(10):
+        p.write("0123456789")
+    assert p.spilled and len(p) == 100
+    with p.view() as mm:
+        assert mm[:10] == b"0123456789"
+    with p.open() as fp:
+        assert fp.read(5) == b"01234"
+    assert p.text() == "0123456789" * 10
+    p.close()
+
+
+class FakeCollector:
+    def __init__(self):
+        self.requests = []
+
+    def collect(self, req):
+        self.requests.append(req)
+        return CollectResponse(raw=Payload.of("preço: 42", max_memory=4), extracted=None, meta={})
+
+def test_runner_extracts_from_payload(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    runner = Runner()
+    runner.collectors["fake"] = fake = FakeCollector()
+    task = Task(id="t", collector="fake", request=CollectRequest(source="x"),
+                extraction={"strategy": "regex", "pattern": r"(\d+)"}, rules=[])
+
+    assert runner.run_task(task)["value"] == "42"
+    assert fake.requests[0].extra["need_content"] is True
+
+def test_regex_runs_over_view_without_loading_text(monkeypatch):
+    p = Payload(max_memory=16)
+    p.write("x" * 100 + "<b>Total: R$ 1.234,56</b>" + "y" * 100)
+    assert p.spilled
+    monkeypatch.setattr(Payload, "text", lambda self: pytest.fail("carregou o texto inteiro"))
+
+    assert regex_value(p, r"Total:\s*R\$\s*([\d.,]+)", re.I) == "1.234,56"
+    assert regex_value(p, r"inexistente") is None
+    with p.open() as fp:   # a view/mmap foi liberada: dá para ler de novo
+        assert fp.read(3) == b"xxx"
+
+def test_regex_non_ascii_pattern_falls_back_to_text():
+    p = Payload.of("Preço: 42")
+    assert regex_value(p, r"preço: (\d+)", re.I) == "42"
+    assert regex_value("valor 7", r"(\d+)") == "7"
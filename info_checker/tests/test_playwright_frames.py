@@ -0,0 +1,118 @@
+from info_checker.collectors import playwright_browser
+from info_checker.collectors.playwright_browser import PlaywrightCollector, PWTimeoutError
+
+
+class FakeFrame:
+    def __init__(self, url, parent=None):
+        self.url = url
+        self.parent_frame = parent
+
+    def is_detached(self):
+        return False
+
+
+class FakePage:
+    """Simula um embed que só navega para o Power BI depois do goto."""
+
+    def __init__(self, late_frames):
+        self.main = FakeFrame("https://portal/relatorio.aspx?id=1")
+        self.frames = [self.main]
+        self.late = list(late_frames)
+        self.handlers = {}
+
+    def on(self, event, fn):
+        self.handlers.setdefault(event, []).append(fn)
+
+    def remove_listener(self, event, fn):
+        self.handlers[event].remove(fn)
+
+    def wait_for_event(self, event, timeout=None):
+        if not self.late:
+            raise RuntimeError("closed")
+        frame = self.late.pop(0)
+        self.frames.append(frame)
+        for fn in list(self.handlers.get("framenavigated", [])):
+            fn(frame)
+        return frame
+
+
+def test_waits_for_late_nested_embed(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    col = PlaywrightCollector()
+    page = FakePage([])
+    wrapper = FakeFrame("https://portal/inner.aspx", parent=page.main)
+    embed = FakeFrame("https://app.powerbi.com/reportEmbed?reportId=x", parent=wrapper)
+    page.late = [wrapper, embed]
+
+    frames = col._wait_for_pbi_frames(page, {"frame_timeout_ms": 5000})
+
+    assert frames == [embed]
+    assert page.handlers == {"frameattached": [], "framenavigated": [], "framedetached": []}
+
+
+def test_multiple_embeds(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    col = PlaywrightCollector()
+    page = FakePage([])
+    a = FakeFrame("https://app.powerbi.com/reportEmbed?reportId=a", parent=page.main)
+    b = FakeFrame("https://app.powerbi.com/reportEmbed?reportId=b", parent=page.main)
+    page.late = [a, b]
+
+    frames = col._wait_for_pbi_frames(page, {"frame_count": 2})
+
+    assert frames == [a, b]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+
+class TimedPage(FakePage):
+    """Frames chegam em instantes (s) de um relógio simulado."""
+
+    def __init__(self, clock, schedule):
+        super().__init__([])
+        self.clock = clock
+        self.schedule = list(schedule)  # [(t, frame)]
+
+    def wait_for_event(self, event, timeout=None):
+        if self.schedule and self.schedule[0][0] <= self.clock.now + timeout / 1000:
+            at, frame = self.schedule.pop(0)
+            self.clock.now = max(self.clock.now, at)
+            self.frames.append(frame)
+            for fn in list(self.handlers.get("framenavigated", [])):
+                fn(frame)
+            return frame
+        self.clock.now += timeout / 1000
+        raise PWTimeoutError("timeout")
+
+
+def test_generic_main_frame_does_not_end_wait(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    clock = FakeClock()
+    monkeypatch.setattr(playwright_browser, "time", clock)
+    col = PlaywrightCollector()
+    page = TimedPage(clock, [])
+    embed = FakeFrame("https://app.powerbi.com/reportEmbed?reportId=x", parent=page.main)
+    page.schedule = [(3.0, embed)]
+
+    frames = col._wait_for_pbi_frames(page, {"frame_timeout_ms": 20000})
+
+    assert frames == [embed]
+    assert clock.now == 3.0
+
+
+def test_regex_also_applies_to_dom_fallback(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    clock = FakeClock()
+    monkeypatch.setattr(playwright_browser, "time", clock)
+    col = PlaywrightCollector()
+    page = TimedPage(clock, [])   # só o portal (relatorio.aspx), que a regex exclui
+
+    frames = col._wait_for_pbi_frames(page, {"frame_timeout_ms": 1000, "frame_url_regex": r"reportEmbed"})
+
+    assert frames == []
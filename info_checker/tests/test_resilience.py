@@ -0,0 +1,101 @@
+import pytest
+
+from info_checker.core.models import CollectRequest, CollectResponse, Task
+from info_checker.core.resilience import CircuitBreaker, CollectFailed
+from info_checker.core.runner import Runner
+
+
+class FlakyCollector:
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+
+    def collect(self, req):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise TimeoutError("slow login")
+        return CollectResponse(raw="ok", extracted=None, meta={})
+
+
+def _task(tid, source="https://pbi.example/r"):
+    return Task(id=tid, collector="flaky", request=CollectRequest(source=source), extraction={}, rules=[])
+
+def _runner(tmp_path, monkeypatch, collector, **resilience):
+    monkeypatch.chdir(tmp_path)
+    runner = Runner(resilience={"jitter": False, **resilience})
+    runner.collectors["flaky"] = collector
+    runner.sleeps = []
+    runner._sleep = runner.sleeps.append
+    return runner
+
+def test_transient_errors_are_retried_with_backoff(tmp_path, monkeypatch):
+    runner = _runner(tmp_path, monkeypatch, FlakyCollector(failures=2), retries=2, backoff_s=1)
+
+    result = runner.run_task(_task("a"))
+
+    assert result["meta"]["resilience"]["attempts"] == 3
+    assert runner.sleeps == [1, 2]
+
+def test_breaker_fails_remaining_tasks_fast(tmp_path, monkeypatch):
+    col = FlakyCollector(failures=100)
+    runner = _runner(tmp_path, monkeypatch, col, retries=1, breaker_threshold=2)
+
+    with pytest.raises(CollectFailed) as first:
+        runner.run_task(_task("a"))
+    with pytest.raises(CollectFailed) as second:
+        runner.run_task(_task("b"))
+
+    assert first.value.meta["resilience"]["attempts"] == 2
+    assert second.value.meta["resilience"] == {
+        "attempts": 0, "breaker": {"host": "pbi.example", "state": "open", "failures": 2}}
+    assert col.calls == 2
+
+def test_breaker_half_open_after_cooldown():
+    now = [0.0]
+    b = CircuitBreaker(threshold=1, cooldown_s=10, clock=lambda: now[0])
+    b.record_failure("h")
+    assert not b.allow("h")
+    now[0] = 11
+    assert b.allow("h") and not b.allow("h")   # uma única tentativa de teste
+    b.record_success("h")
+    assert b.state("h") == "closed"
+
+def test_invalid_url_is_not_retried(tmp_path, monkeypatch):
+    requests = pytest.importorskip("requests")
+
+    class BadUrlCollector:
+        calls = 0
+
+        def collect(self, req):
+            self.calls += 1
+            raise requests.exceptions.InvalidURL(f"Invalid URL {req.source!r}")
+
+    col = BadUrlCollector()
+    runner = _runner(tmp_path, monkeypatch, col, retries=2, breaker_threshold=1)
+
+    with pytest.raises(CollectFailed) as failed:
+        runner.run_task(_task("a", source="https://URL QUE DESEJA ACESSAR"))
+
+    assert col.calls == 1
+    assert failed.value.meta["resilience"]["attempts"] == 1
+    assert failed.value.meta["resilience"]["breaker"]["state"] == "closed"
+
+def test_frame_not_found_counts_as_failure(tmp_path, monkeypatch):
+    class OutageCollector:
+        calls = 0
+
+        def collect(self, req):
+            self.calls += 1
+            return CollectResponse(raw=None, extracted=None, meta={"engine": "playwright", "frame": "not_found"})
+
+    col = OutageCollector()
+    runner = _runner(tmp_path, monkeypatch, col, retries=1, breaker_threshold=2)
+
+    with pytest.raises(CollectFailed) as first:
+        runner.run_task(_task("a"))
+    with pytest.raises(CollectFailed):
+        runner.run_task(_task("b"))
+
+    assert first.value.meta["frame"] == "not_found"
+    assert first.value.meta["resilience"]["attempts"] == 2
+    assert col.calls == 2   # circuito aberto: a task 'b' nem tenta
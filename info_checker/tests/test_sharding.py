@@ -0,0 +1,53 @@
+import time
+
+import pytest
+
+from info_checker.core.models import CollectRequest, Task
+from info_checker.core.sharding import select_shard, shard_of
+from info_checker.utils.exports import merge_run_to_xlsx
+from info_checker.utils.locking import file_lock
+
+
+def _task(tid):
+    return Task(id=tid, collector="http", request=CollectRequest(source="x"), extraction={}, rules=[])
+
+def test_shards_partition_tasks():
+    tasks = [_task(f"t{i}") for i in range(50)]
+    shards = [select_shard(tasks, i, 4) for i in range(4)]
+    ids = [t.id for s in shards for t in s]
+    assert sorted(ids) == sorted(t.id for t in tasks)
+    assert len(ids) == len(set(ids))
+
+def test_shard_is_stable():
+    # valores fixos: o hash não pode depender do processo/host (ex.: hash() com PYTHONHASHSEED)
+    assert shard_of("vidas_vigentes_playwright", 7) == 0
+    assert shard_of("precos_http", 7) == 3
+    assert shard_of("dashboard_desktop", 3) == 2
+    assert shard_of("abc", 1) == 0
+
+def test_merge_run_combines_task_dirs(tmp_path):
+    pd = pytest.importorskip("pandas")
+    pytest.importorskip("openpyxl")
+    run_dir = tmp_path / "runs" / "r1"
+    for task, value in (("task_a", 1), ("task_b", 2)):
+        (run_dir / task).mkdir(parents=True)
+        (run_dir / task / "Performance.csv").write_text(f"col\n{value}\n", encoding="utf-8")
+
+    out = merge_run_to_xlsx(run_dir)
+
+    assert out == str(run_dir / "r1.xlsx")
+    assert not (run_dir / "r1.tmp.xlsx").exists()
+    sheets = pd.read_excel(out, sheet_name=None)
+    assert list(sheets) == ["task_a_Performance", "task_b_Performance"]
+    assert sheets["task_b_Performance"]["col"].tolist() == [2]
+
+def test_held_lock_is_not_taken_as_stale(tmp_path):
+    target = tmp_path / "out.xlsx"
+    with file_lock(target, stale_after=0.3) as lock_path:
+        time.sleep(0.6)   # dono ainda escrevendo: o heartbeat renova o mtime
+        with pytest.raises(TimeoutError):
+            with file_lock(target, timeout=0.3, poll=0.05, stale_after=0.3):
+                pass
+        # outro processo assumiu o lock: o dono antigo não pode apagá-lo
+        lock_path.write_text("outro:1:token", encoding="utf-8")
+    assert lock_path.read_text(encoding="utf-8") == "outro:1:token"
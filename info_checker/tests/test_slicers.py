@@ -0,0 +1,71 @@
+from pathlib import Path
+
+from info_checker.collectors.playwright_browser import PlaywrightCollector
+from info_checker.core.models import CollectRequest, CollectResponse
+
+
+def test_slicer_combinations_reapply_only_changed(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    col = PlaywrightCollector()
+    applied, written = [], []
+    monkeypatch.setattr(col, "_apply_slicer", lambda frame, name, value: applied.append((name, value)) or True)
+    monkeypatch.setattr(col, "_extract_table_to_csv", lambda frame, path, name: written.append(Path(path).name) or True)
+    monkeypatch.setattr(col, "_visual_signature", lambda frame: "sig")
+    monkeypatch.setattr(col, "_wait_visuals_refresh", lambda frame, before, timeout_ms: True)
+
+    combos = col._slicer_combinations([
+        {"name": "Região", "values": ["Sul", "Norte"]},
+        {"name": "Mês", "values": ["jan/24", "fev/24"]},
+    ])
+    stats = col._extract_slicer_combinations(None, object(), combos, tmp_path, "", tmp_path, 100)
+
+    assert stats == {"combinations": 4, "extracted": 4, "failed": []}
+    assert written[0] == "Região=Sul_Mês=jan-24.csv"
+    # 2 slicers na 1ª combinação, depois só o que mudou em cada uma
+    assert applied == [("Região", "Sul"), ("Mês", "jan/24"), ("Mês", "fev/24"),
+                       ("Região", "Norte"), ("Mês", "jan/24"), ("Mês", "fev/24")]
+
+
+def test_already_selected_slicer_does_not_wait(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    col = PlaywrightCollector()
+    waits = []
+    monkeypatch.setattr(col, "_apply_slicer", lambda frame, name, value: value != "Sul")  # 'Sul' já selecionado
+    monkeypatch.setattr(col, "_extract_table_to_csv", lambda frame, path, name: True)
+    monkeypatch.setattr(col, "_visual_signature", lambda frame: "sig")
+    monkeypatch.setattr(col, "_wait_visuals_refresh", lambda frame, before, timeout_ms: waits.append(before))
+
+    combos = col._slicer_combinations([{"name": "Região", "values": ["Sul", "Norte"]}])
+    col._extract_slicer_combinations(None, object(), combos, tmp_path, "", tmp_path, 100)
+
+    assert len(waits) == 1   # só a troca para 'Norte'
+
+
+def test_variant_after_slicers_reloads_report(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    col = PlaywrightCollector()
+
+    class Page:
+        def set_default_timeout(self, ms):
+            pass
+
+    class Context:
+        def new_page(self):
+            return Page()
+
+        def close(self):
+            pass
+
+    browser = type("Browser", (), {"new_context": lambda self, **kw: Context()})()
+    reuse = []
+    monkeypatch.setattr(col, "_perform_login", lambda *a, **kw: None)
+    monkeypatch.setattr(col, "_collect_report", lambda page, req, reuse_page=False: reuse.append(reuse_page)
+                        or CollectResponse(raw=None, extracted=None, meta={}))
+    slicers = [{"name": "Mês", "values": ["jan", "fev"]}]
+    reqs = [CollectRequest(source="https://pbi/r", extra={"slicers": slicers}),
+            CollectRequest(source="https://pbi/r", extra={}),
+            CollectRequest(source="https://pbi/r", extra={})]
+
+    col._collect_session(browser, ("https://login", "u", "p", False, None), reqs)
+
+    assert reuse == [False, False, True]
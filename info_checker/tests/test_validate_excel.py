@@ -0,0 +1,70 @@
+import importlib.util
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("openpyxl")
+pytest.importorskip("pandas")
+
+from info_checker.utils.exports import merge_csvs_to_xlsx
+
+_spec = importlib.util.spec_from_file_location(
+    "validate_excel", Path(__file__).resolve().parents[2] / "tools" / "validate_excel.py")
+validate_excel = importlib.util.module_from_spec(_spec)
+sys.modules["validate_excel"] = validate_excel  # workers do ProcessPool precisam achar o módulo
+_spec.loader.exec_module(validate_excel)
+
+
+def _export(tmp_path):
+    csv_dir = tmp_path / "powerbi"
+    csv_dir.mkdir()
+    (csv_dir / "Performance.csv").write_text("Mês,Vidas,Valor\njan/24,10,12.50\nfev/24,11,\n", encoding="utf-8")
+    (csv_dir / "Parâmetros.csv").write_text("Nome,Ativo\nx,True\n", encoding="utf-8")
+    xlsx = str(tmp_path / "out.xlsx")
+    merge_csvs_to_xlsx([(p.stem, str(p)) for p in sorted(csv_dir.glob("*.csv"))], xlsx)
+    return csv_dir, xlsx
+
+def test_export_matches_source_csvs(tmp_path):
+    csv_dir, xlsx = _export(tmp_path)
+    report = tmp_path / "r.json"
+
+    rc = validate_excel.main([xlsx, "--csv-dir", str(csv_dir), "--workers", "2", "--report", str(report)])
+
+    data = json.loads(report.read_text(encoding="utf-8"))
+    assert rc == 0 and data["ok"]
+    assert {s["sheet"]: s["rows"] for s in data["sheets"]} == {"Parâmetros": 2, "Performance": 3}
+
+def test_truncated_export_is_flagged(tmp_path):
+    csv_dir, xlsx = _export(tmp_path)
+    with open(csv_dir / "Performance.csv", "a", encoding="utf-8") as f:
+        f.write("mar/24,12,1,extra\n")
+    report = tmp_path / "r.json"
+
+    rc = validate_excel.main([xlsx, "--csv-dir", str(csv_dir), "--workers", "1", "--report", str(report)])
+
+    perf = next(s for s in json.loads(report.read_text(encoding="utf-8"))["sheets"] if s["sheet"] == "Performance")
+    assert rc == 1 and not perf["ok"]
+    assert perf["csv"]["ragged_rows"] == 1 and "linhas: excel=3 csv=4" in perf["issues"]
+
+def test_long_numbers_are_compared_exactly(tmp_path):
+    norm = validate_excel._norm_cell
+    assert norm("12345678901") != norm(12345678902)
+    assert norm("12345678901") == norm(12345678901) == norm(12345678901.0)
+    assert norm("0.1234567890123") != norm(0.1234567890124)
+    assert norm("12.50") == norm(12.5)
+
+    csv_dir = tmp_path / "powerbi"
+    csv_dir.mkdir()
+    src = csv_dir / "Apolices.csv"
+    src.write_text("CPF,Apolice\n12345678901,98765432101234\n", encoding="utf-8")
+    xlsx = str(tmp_path / "out.xlsx")
+    merge_csvs_to_xlsx([(src.stem, str(src))], xlsx)
+    src.write_text("CPF,Apolice\n12345678902,98765432101234\n", encoding="utf-8")  # um dígito trocado
+    report = tmp_path / "r.json"
+
+    rc = validate_excel.main([xlsx, "--csv-dir", str(csv_dir), "--workers", "1", "--report", str(report)])
+
+    sheet = json.loads(report.read_text(encoding="utf-8"))["sheets"][0]
+    assert rc == 1 and "conteúdo diferente do CSV (checksum)" in sheet["issues"]
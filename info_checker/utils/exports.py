@@ -0,0 +1,82 @@
+import os
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from .locking import file_lock
+from .log import get_logger
+
+log = get_logger(__name__)
+
+# pandas opcional (para Excel)
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+
+def run_dir_for(output_root, run_id: str) -> Path:
+    """Diretório de uma execução: <output_root>/runs/<run_id>."""
+    return Path(output_root) / "runs" / run_id
+
+
+def task_dir_for(run_dir, task_id: str) -> Path:
+    """Diretório exclusivo de uma task dentro da execução."""
+    safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in task_id)
+    return Path(run_dir) / safe
+
+
+def merge_csvs_to_xlsx(sheets: List[Tuple[str, str]], out_xlsx: str) -> str:
+    """
+    Escreve cada (nome_da_aba, caminho_csv) como uma aba do Excel.
+    Escreve num temporário ('<nome>.tmp.xlsx') e troca atomicamente, sob lock, para que processos
+    concorrentes nunca vejam (nem sobrescrevam) um arquivo pela metade.
+    """
+    if pd is None:
+        raise RuntimeError("Pandas não encontrado. Instale: pip install pandas openpyxl")
+    if not sheets:
+        raise RuntimeError(f"Nenhum CSV para gerar: {Path(out_xlsx).resolve()}")
+    Path(out_xlsx).parent.mkdir(parents=True, exist_ok=True)
+    with file_lock(out_xlsx):
+        # o pandas escolhe/valida o engine pela extensão: o temporário mantém o '.xlsx'
+        root, ext = os.path.splitext(out_xlsx)
+        tmp = f"{root}.tmp{ext or '.xlsx'}"
+        used = set()
+        with pd.ExcelWriter(tmp, engine="openpyxl", mode="w") as writer:
+            for name, path in sheets:
+                sheet = _unique_sheet_name(name, used)
+                try:
+                    df = pd.read_csv(path, encoding="utf-8")
+                    df.to_excel(writer, index=False, sheet_name=sheet)
+                except Exception as e:
+                    log.warning(f"falha ao escrever '{sheet}': {e}")
+        os.replace(tmp, out_xlsx)
+    log.info(f"Excel gerado: {Path(out_xlsx).resolve()}")
+    return out_xlsx
+
+
+def merge_run_to_xlsx(run_dir, out_xlsx: Optional[str] = None) -> str:
+    """
+    Junta os CSVs de todas as tasks (de todos os shards) de uma execução
+    em um único Excel, sem refazer a extração. Abas: '<task>_<csv>'.
+    """
+    run_dir = Path(run_dir)
+    if not run_dir.is_dir():
+        raise RuntimeError(f"Execução não encontrada: {run_dir.resolve()}")
+    sheets: List[Tuple[str, str]] = []
+    for task_dir in sorted(p for p in run_dir.iterdir() if p.is_dir()):
+        for csv_path in sorted(task_dir.glob("*.csv")):
+            sheets.append((f"{task_dir.name}_{csv_path.stem}", str(csv_path)))
+    out_xlsx = out_xlsx or str(run_dir / f"{run_dir.name}.xlsx")
+    return merge_csvs_to_xlsx(sheets, out_xlsx)
+
+
+def _unique_sheet_name(name: str, used: set) -> str:
+    # Excel limita nomes de aba a 31 caracteres e não aceita duplicados
+    base = name[:31]
+    sheet, n = base, 1
+    while sheet.lower() in used:
+        suffix = f"~{n}"
+        sheet = base[:31 - len(suffix)] + suffix
+        n += 1
+    used.add(sheet.lower())
+    return sheet
@@ -0,0 +1,73 @@
+import os
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+
+def _read_token(lock_path: Path):
+    try:
+        return lock_path.read_text(encoding="utf-8")
+    except (FileNotFoundError, OSError):
+        return None
+
+
+@contextmanager
+def file_lock(path, timeout: float = 120.0, poll: float = 0.2, stale_after: float = 600.0):
+    """
+    Lock exclusivo baseado em arquivo '<path>.lock' (O_CREAT | O_EXCL).
+    Funciona entre processos e entre máquinas que compartilham o mesmo diretório
+    (ex.: pasta de rede), inclusive no Windows. O dono renova o mtime do lock
+    enquanto o segura; locks sem renovação há mais de `stale_after` segundos são
+    considerados abandonados e removidos. Cada lock leva um token único, e só
+    quem tem o token o apaga.
+    """
+    lock_path = Path(str(path) + ".lock")
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    token = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex}"
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            fd = os.open(str(lock_path), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                stale_token = _read_token(lock_path)
+                if time.time() - lock_path.stat().st_mtime > stale_after:
+                    # só remove se ainda é o mesmo lock abandonado (outro processo pode ter recriado)
+                    if _read_token(lock_path) == stale_token:
+                        lock_path.unlink()
+                    continue
+            except FileNotFoundError:
+                continue
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Timeout aguardando lock: {lock_path}")
+            time.sleep(poll)
+
+    stop = threading.Event()
+
+    def heartbeat():
+        # mantém o lock "vivo" durante escritas longas (ex.: merge grande)
+        while not stop.wait(max(stale_after / 3, 0.05)):
+            try:
+                if _read_token(lock_path) != token:
+                    return
+                os.utime(lock_path)
+            except OSError:
+                return
+
+    try:
+        os.write(fd, token.encode("utf-8"))
+        os.close(fd)
+        beat = threading.Thread(target=heartbeat, name=f"lock:{lock_path.name}", daemon=True)
+        beat.start()
+        yield lock_path
+    finally:
+        stop.set()
+        if _read_token(lock_path) == token:
+            try:
+                lock_path.unlink()
+            except FileNotFoundError:
+                pass
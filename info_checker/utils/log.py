@@ -1 +1,60 @@
-# Poderia adicionar configuração de logging estruturado aqui.
+"""
+Logging do Info Checker.
+
+Diagnósticos vão sempre para stderr (ou arquivo), nunca para stdout, que fica
+reservado aos resultados das tasks. Dois formatos:
+  - text: "[INFO] mensagem" (mesmo visual dos antigos prints)
+  - json: um objeto por linha {ts, level, logger, msg, ...campos extras}
+Campos extras: log.info("msg", extra={"fields": {"task_id": "x"}}).
+"""
+import json
+import logging
+import sys
+from datetime import datetime, timezone
+
+ROOT = "info_checker"
+
+# rótulos usados historicamente nos prints
+_TAGS = {"DEBUG": "DEBUG", "INFO": "INFO", "WARNING": "WARN", "ERROR": "ERRO", "CRITICAL": "ERRO"}
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        msg = f"[{_TAGS.get(record.levelname, record.levelname)}] {record.getMessage()}"
+        if record.exc_info:
+            msg += "\n" + self.formatException(record.exc_info)
+        return msg
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        data.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+def setup_logging(fmt: str = "text", level: str = "DEBUG", stream=None, path: str | None = None):
+    """Configura o logger raiz do pacote (idempotente: troca o handler anterior)."""
+    logger = logging.getLogger(ROOT)
+    for h in list(logger.handlers):
+        logger.removeHandler(h)
+        h.close()
+    handler = logging.FileHandler(path, encoding="utf-8") if path else logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+    logger.addHandler(handler)
+    logger.setLevel(level.upper())
+    logger.propagate = False
+    return logger
+
+
+def get_logger(name: str = ROOT) -> logging.Logger:
+    if name != ROOT and not name.startswith(ROOT + "."):
+        name = f"{ROOT}.{name}"
+    return logging.getLogger(name)
@@ -0,0 +1,64 @@
+import json
+import sys
+from typing import Any, Dict, List, Optional
+
+FORMATS = ("ndjson", "json", "pretty")
+
+
+class ResultWriter:
+    """
+    Escreve o resultado de cada task (stdout ou arquivo) assim que ela termina.
+      - ndjson: uma linha JSON compacta por task, com flush a cada linha
+      - pretty: JSON indentado por task (formato antigo)
+      - json: um único array JSON, escrito ao final
+    Com ordered=True os resultados saem na ordem das tasks (útil com --workers > 1):
+    cada um é liberado assim que todos os anteriores já tiverem saído.
+    """
+
+    def __init__(self, fmt: str = "pretty", path: Optional[str] = None, ordered: bool = False):
+        if fmt not in FORMATS:
+            raise ValueError(f"Formato de saída não suportado: {fmt}")
+        self.fmt = fmt
+        self.ordered = ordered
+        self._fp = open(path, "w", encoding="utf-8") if path else sys.stdout
+        self._owns_fp = bool(path)
+        self._pending: Dict[int, Dict[str, Any]] = {}
+        self._next = 0
+        self._collected: List[Dict[str, Any]] = []
+
+    def submit(self, index: int, result: Dict[str, Any]):
+        if not self.ordered:
+            self._emit(result)
+            return
+        self._pending[index] = result
+        while self._next in self._pending:
+            self._emit(self._pending.pop(self._next))
+            self._next += 1
+
+    def _emit(self, result: Dict[str, Any]):
+        if self.fmt == "json":
+            self._collected.append(result)
+            return
+        if self.fmt == "ndjson":
+            line = json.dumps(result, ensure_ascii=False, separators=(",", ":"), default=str)
+        else:
+            line = json.dumps(result, ensure_ascii=False, indent=2, default=str)
+        self._fp.write(line + "\n")
+        self._fp.flush()
+
+    def close(self):
+        # resultados ainda retidos pela ordenação (não deveria sobrar nada)
+        for index in sorted(self._pending):
+            self._emit(self._pending.pop(index))
+        if self.fmt == "json":
+            json.dump(self._collected, self._fp, ensure_ascii=False, separators=(",", ":"), default=str)
+            self._fp.write("\n")
+        self._fp.flush()
+        if self._owns_fp:
+            self._fp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,31 +1,267 @@
+"""
+Checagem de integridade do Excel exportado contra os CSVs de origem.
+
+Lê TODAS as abas em modo read-only, linha a linha (memória constante, exceto a
+tabela de strings compartilhadas que o openpyxl carrega), com uma aba por processo.
+Para cada aba compara com o CSV correspondente (mesma regra de nomes do merge):
+  - nº de linhas e de colunas
+  - checksum do conteúdo (valores normalizados: números, vazios, booleanos)
+  - linhas "tortas" (largura diferente do cabeçalho) e abas vazias
+No final grava um relatório JSON (--report) e sai com 0 (ok), 1 (problemas) ou 2 (erro).
+
+Uso:
+    python tools/validate_excel.py exports/powerbi_export.xlsx --csv-dir exports/powerbi
+    python tools/validate_excel.py exports/runs/<run>/<run>.xlsx --csv-dir exports/runs/<run>
+"""
+import argparse
+import csv
+import hashlib
+import json
 import os
+import re
 import sys
+from concurrent.futures import ProcessPoolExecutor
+
+DEFAULT_XLSX = os.path.join("exports", "powerbi_export.xlsx")
+DEFAULT_CSV_DIR = os.path.join("exports", "powerbi")
+MAX_EXAMPLES = 10
+_INT_RE = re.compile(r"^[+-]?\d+$")
+
+
+def _norm_cell(v) -> str:
+    # pandas converte "12.50" em 12.5 e "" em vazio ao gerar o Excel: normaliza os dois lados
+    if v is None:
+        return ""
+    if isinstance(v, bool):
+        return "true" if v else "false"
+    s = str(v).strip()
+    if s.lower() in ("true", "false"):
+        return s.lower()
+    if s.lower() == "nan":
+        return ""
+    if _INT_RE.match(s):
+        return str(int(s))  # inteiros longos (CPF, apólice, IDs) sem passar por float
+    try:
+        f = float(s)
+    except ValueError:
+        return s
+    # repr é exato (ida e volta); integrais sem '.0' para casar "12" com 12.0
+    return str(int(f)) if f.is_integer() else repr(f)
+
+
+class _RowStats:
+    """Acumula contagens/checksum de um fluxo de linhas sem guardá-las."""
+
+    def __init__(self):
+        self.rows = 0
+        self.cols = 0
+        self.width = None  # largura do cabeçalho
+        self.ragged = 0
+        self.ragged_examples = []
+        self._hash = hashlib.sha256()
+
+    def add(self, values):
+        cells = [_norm_cell(v) for v in values]
+        while cells and cells[-1] == "":
+            cells.pop()
+        self.rows += 1
+        if not cells:
+            self._hash.update(b"\x1e")
+            return
+        self.cols = max(self.cols, len(cells))
+        if self.width is None:
+            self.width = len(cells)
+        elif len(cells) > self.width:
+            # linhas mais curtas que o cabeçalho são comuns (vazios no fim); mais longas, não
+            self.ragged += 1
+            if len(self.ragged_examples) < MAX_EXAMPLES:
+                self.ragged_examples.append(self.rows)
+        self._hash.update("\x1f".join(cells).encode("utf-8") + b"\x1e")
+
+    def finish(self):
+        return {
+            "rows": self.rows,
+            "cols": self.cols,
+            "ragged_rows": self.ragged,
+            "ragged_examples": self.ragged_examples,
+            "checksum": self._hash.hexdigest(),
+        }
+
+
+def _stream_sheet(xlsx: str, sheet: str) -> dict:
+    from openpyxl import load_workbook
+
+    wb = load_workbook(xlsx, read_only=True, data_only=True)
+    try:
+        stats, pending_blank = _RowStats(), 0
+        for row in wb[sheet].iter_rows(values_only=True):
+            if all(v is None or str(v).strip() == "" for v in row):
+                pending_blank += 1  # só conta se vier conteúdo depois
+                continue
+            for _ in range(pending_blank):
+                stats.add(())
+            pending_blank = 0
+            stats.add(row)
+        return stats.finish()
+    finally:
+        wb.close()
+
+
+def _stream_csv(path: str) -> dict:
+    stats, pending_blank = _RowStats(), 0
+    with open(path, newline="", encoding="utf-8") as fp:
+        for row in csv.reader(fp):
+            if all(c.strip() == "" for c in row):
+                pending_blank += 1
+                continue
+            for _ in range(pending_blank):
+                stats.add(())
+            pending_blank = 0
+            stats.add(row)
+    return stats.finish()
+
+
+def check_sheet(xlsx: str, sheet: str, csv_path: str | None) -> dict:
+    """Worker (roda em outro processo): valida uma aba e, se houver, o CSV de origem."""
+    result = {"sheet": sheet, "issues": []}
+    try:
+        result.update(_stream_sheet(xlsx, sheet))
+    except Exception as e:
+        result.update(ok=False, issues=[f"falha ao ler a aba: {e}"])
+        return result
+
+    issues = result["issues"]
+    if result["rows"] == 0:
+        issues.append("aba vazia")
+    elif result["rows"] == 1:
+        issues.append("aba só com cabeçalho")
+    if result["ragged_rows"]:
+        issues.append(f"{result['ragged_rows']} linha(s) mais largas que o cabeçalho")
+
+    result["csv"] = None
+    if csv_path:
+        try:
+            src = _stream_csv(csv_path)
+        except Exception as e:
+            issues.append(f"falha ao ler o CSV: {e}")
+        else:
+            result["csv"] = {"path": csv_path, **src}
+            if src["ragged_rows"]:
+                issues.append(f"CSV com {src['ragged_rows']} linha(s) mais largas que o cabeçalho")
+            if src["rows"] != result["rows"]:
+                issues.append(f"linhas: excel={result['rows']} csv={src['rows']}")
+            if src["cols"] != result["cols"]:
+                issues.append(f"colunas: excel={result['cols']} csv={src['cols']}")
+            if src["checksum"] != result["checksum"]:
+                issues.append("conteúdo diferente do CSV (checksum)")
+    result["ok"] = not issues
+    return result
+
+
+def _sheet_name(name: str, used: set) -> str:
+    # mesma regra de info_checker.utils.exports._unique_sheet_name
+    base = name[:31]
+    sheet, n = base, 1
+    while sheet.lower() in used:
+        suffix = f"~{n}"
+        sheet = base[:31 - len(suffix)] + suffix
+        n += 1
+    used.add(sheet.lower())
+    return sheet
+
+
+def source_csvs(csv_dir: str) -> dict:
+    """
+    Mapeia nome de aba -> CSV de origem, na mesma ordem/regra do merge:
+    CSVs direto na pasta viram '<csv>'; numa pasta de run, '<task>_<csv>'.
+    """
+    if not csv_dir or not os.path.isdir(csv_dir):
+        return {}
+    entries = []
+    top = sorted(f for f in os.listdir(csv_dir) if f.lower().endswith(".csv"))
+    if top:
+        entries = [(os.path.splitext(f)[0], os.path.join(csv_dir, f)) for f in top]
+    else:
+        for sub in sorted(os.listdir(csv_dir)):
+            sub_path = os.path.join(csv_dir, sub)
+            if os.path.isdir(sub_path):
+                for f in sorted(os.listdir(sub_path)):
+                    if f.lower().endswith(".csv"):
+                        entries.append((f"{sub}_{os.path.splitext(f)[0]}", os.path.join(sub_path, f)))
+    used: set = set()
+    return {_sheet_name(name, used): path for name, path in entries}
 
-XLSX = sys.argv[1] if len(sys.argv) > 1 else os.path.join("exports", "powerbi_export.xlsx")
 
-def main():
-    if not os.path.exists(XLSX):
-        print(f"[ERRO] Arquivo não encontrado: {os.path.abspath(XLSX)}")
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Valida o Excel exportado contra os CSVs de origem")
+    ap.add_argument("xlsx", nargs="?", default=DEFAULT_XLSX, help=f"Excel a validar (default: {DEFAULT_XLSX})")
+    ap.add_argument("--csv-dir", default=DEFAULT_CSV_DIR, help=f"Pasta dos CSVs de origem (default: {DEFAULT_CSV_DIR})")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processos em paralelo (uma aba por vez cada)")
+    ap.add_argument("--report", default=None, help="Relatório JSON (default: <xlsx>.report.json; '-' = stdout)")
+    return ap.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    xlsx = args.xlsx
+    if not os.path.exists(xlsx):
+        print(f"[ERRO] Arquivo não encontrado: {os.path.abspath(xlsx)}", file=sys.stderr)
         return 2
     try:
         from openpyxl import load_workbook
     except Exception:
-        print("[ERRO] openpyxl não instalado. Rode: pip install openpyxl")
+        print("[ERRO] openpyxl não instalado. Rode: pip install openpyxl", file=sys.stderr)
         return 2
 
     try:
-        wb = load_workbook(XLSX, read_only=True, data_only=True)
-        print(f"[OK] Abas ({len(wb.sheetnames)}):", ", ".join(wb.sheetnames))
-        # tenta acessar a primeira planilha e ler algumas células
-        ws = wb[wb.sheetnames[0]]
-        rows = 0
-        for _ in ws.iter_rows(min_row=1, max_row=10, max_col=10, values_only=True):
-            rows += 1
-        print(f"[OK] Leituras de teste concluídas ({rows} linhas amostradas).")
-        return 0
+        wb = load_workbook(xlsx, read_only=True)
+        sheets = list(wb.sheetnames)
+        wb.close()
     except Exception as e:
-        print("[ERRO] Falha ao abrir/ler o Excel:", e)
-        return 1
+        print("[ERRO] Falha ao abrir/ler o Excel:", e, file=sys.stderr)
+        return 2
+
+    csvs = source_csvs(args.csv_dir)
+    if not csvs:
+        print(f"[WARN] Sem CSVs de origem em {os.path.abspath(args.csv_dir)}: só checagens estruturais.",
+              file=sys.stderr)
+    by_lower = {k.lower(): v for k, v in csvs.items()}
+    jobs = [(xlsx, s, by_lower.get(s.lower())) for s in sheets]
+
+    if args.workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=min(args.workers, len(jobs))) as pool:
+            results = list(pool.map(check_sheet, *zip(*jobs)))
+    else:
+        results = [check_sheet(*job) for job in jobs]
+
+    sheet_lower = {s.lower() for s in sheets}
+    missing = sorted(name for name in csvs if name.lower() not in sheet_lower)
+    ok = bool(sheets) and all(r["ok"] for r in results) and not missing
+    report = {
+        "xlsx": os.path.abspath(xlsx),
+        "csv_dir": os.path.abspath(args.csv_dir) if csvs else None,
+        "ok": ok,
+        "sheets": results,
+        "missing_sheets": missing,
+    }
+
+    for r in results:
+        status = "OK" if r["ok"] else "ERRO"
+        print(f"[{status}] {r['sheet']}: {r.get('rows', '?')} linhas x {r.get('cols', '?')} colunas"
+              + ("" if r["ok"] else " — " + "; ".join(r["issues"])), file=sys.stderr)
+    for name in missing:
+        print(f"[ERRO] CSV sem aba correspondente: {name}", file=sys.stderr)
+
+    out = args.report or xlsx + ".report.json"
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if out == "-":
+        print(text)
+    else:
+        with open(out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"[INFO] Relatório: {os.path.abspath(out)}", file=sys.stderr)
+    return 0 if ok else 1
+
 
 if __name__ == "__main__":
     raise SystemExit(main())